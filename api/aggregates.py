@@ -0,0 +1,49 @@
+"""
+Vectorized client-side aggregation helpers
+
+Detection rows are aggregated over contiguous NumPy column arrays
+(structure-of-arrays) in a single compiled pass instead of iterating
+per-row Python dicts. Numba is optional; without it the kernel runs as
+plain NumPy-backed Python, which is still far cheaper than dict loops.
+"""
+import numpy as np
+
+try:
+    from numba import njit
+    HAS_NUMBA = True
+except ImportError:
+    HAS_NUMBA = False
+
+    def njit(*args, **kwargs):
+        def wrap(func):
+            return func
+        return wrap
+
+
+@njit(cache=True)
+def groupby_sum_mean(group_ids, values, n_groups):
+    """Single-pass per-group count, sum and mean
+
+    `group_ids` maps each row to a dense group index in [0, n_groups);
+    `values` holds the measure column. Returns (counts, sums, means).
+    """
+    counts = np.zeros(n_groups, dtype=np.int64)
+    sums = np.zeros(n_groups, dtype=np.float64)
+    for i in range(group_ids.shape[0]):
+        g = group_ids[i]
+        counts[g] += 1
+        sums[g] += values[i]
+    means = sums / np.maximum(counts, 1)
+    return counts, sums, means
+
+
+def summarize_by_class(classes, confidences):
+    """Aggregate detection rows into per-class count and mean confidence
+
+    Returns (labels, counts, mean_confidences) ordered by count descending.
+    """
+    labels, group_ids = np.unique(np.asarray(classes, dtype=object), return_inverse=True)
+    values = np.fromiter(confidences, dtype=np.float64, count=group_ids.shape[0])
+    counts, _, means = groupby_sum_mean(group_ids.astype(np.int64), values, labels.shape[0])
+    order = np.argsort(counts)[::-1]
+    return labels[order], counts[order], means[order]
@@ -1,70 +1,129 @@
 """
 CRUD operations for analytical queries
 """
+import threading
 from typing import List, Optional, Dict, Any
 from datetime import datetime
+from operator import attrgetter
+from cachetools import TTLCache, cachedmethod
+from .aggregates import summarize_by_class
 from .database import db_manager
 from .schemas import *
 import logging
 
 logger = logging.getLogger(__name__)
 
+# In-process TTL cache settings for idempotent read methods
+CACHE_MAXSIZE = 512
+CACHE_TTL_SECONDS = 60
+
+# Materialized views serving the heavy aggregate endpoints
+# (created by scripts/db_migrations.py)
+MATERIALIZED_VIEWS = [
+    'mv_top_products',
+    'mv_engagement_daily',
+    'mv_channel_summary',
+    'mv_summary_stats',
+]
+
 class AnalyticsCRUD:
     """CRUD operations for analytics queries"""
     
     def __init__(self):
         self.db = db_manager
-    
+        self._cache = TTLCache(maxsize=CACHE_MAXSIZE, ttl=CACHE_TTL_SECONDS)
+        # cachetools caches are not thread-safe, and the cached methods
+        # run on AnyIO's threadpool; the lock serializes lookups,
+        # insertions and TTL expiry sweeps
+        self._lock = threading.Lock()
+
+    @cachedmethod(attrgetter('_cache'), lock=attrgetter('_lock'))
     def get_top_products(self, limit: int = 10) -> List[Dict[str, Any]]:
         """Get top detected objects/products"""
         query = """
-            SELECT 
-                detected_object_class as object_class,
+            SELECT
+                object_class,
                 object_category,
                 total_detections,
                 messages_with_object,
                 channels_with_object,
                 avg_confidence,
                 frequency_category,
-                importance_score
-            FROM analytics.dim_objects
+                importance_score,
+                updated_at
+            FROM analytics.mv_top_products
             ORDER BY total_detections DESC
             LIMIT %s
         """
         try:
             return self.db.execute_query(query, (limit,))
         except Exception as e:
-            logger.error(f"Error getting top products: {e}")
+            logger.exception("get_top_products failed")
             raise
     
-    def get_channel_activity(self, channel_name: str, days: int = 30) -> List[Dict[str, Any]]:
-        """Get channel activity over time"""
+    def get_channel_activity(self, channel_name: str, days: int = 30) -> Dict[str, Any]:
+        """Get channel activity over time plus the roll-up totals
+
+        GROUPING SETS produce the per-day series and the overall totals
+        from the same aggregation pass, so dashboards that want both
+        cost one scan instead of two queries.
+        """
+        # Reads the incrementally maintained daily rollup rather than
+        # re-aggregating the fact table
         query = """
-            SELECT 
+            SELECT
                 dc.channel_name,
-                dd.date_day as date,
-                COUNT(fm.message_id) as message_count,
-                SUM(fm.view_count) as total_views,
-                SUM(fm.forward_count) as total_forwards,
-                AVG(fm.engagement_score) as avg_engagement_score
-            FROM analytics.fct_messages fm
-            JOIN analytics.dim_channels dc ON fm.channel_key = dc.channel_key
-            JOIN analytics.dim_dates dd ON fm.date_key = dd.date_key
+                r.date_day as date,
+                SUM(r.message_count) as message_count,
+                SUM(r.sum_views) as total_views,
+                SUM(r.sum_forwards) as total_forwards,
+                SUM(r.sum_engagement) / NULLIF(SUM(r.message_count), 0) as avg_engagement_score
+            FROM analytics.rollup_engagement_daily r
+            JOIN analytics.dim_channels dc ON r.channel_key = dc.channel_key
             WHERE dc.channel_name = %s
-            AND dd.date_day >= CURRENT_DATE - INTERVAL '%s days'
-            GROUP BY dc.channel_name, dd.date_day
-            ORDER BY dd.date_day DESC
+            AND r.date_day >= CURRENT_DATE - make_interval(days => %s)
+            GROUP BY GROUPING SETS ((dc.channel_name, r.date_day), (dc.channel_name))
+            ORDER BY r.date_day DESC NULLS LAST
         """
         try:
-            return self.db.execute_query(query, (channel_name, days))
+            rows = self.db.execute_query(query, (channel_name, days))
+            # The roll-up row has a NULL date (ordered last)
+            series = [row for row in rows if row['date'] is not None]
+            totals = next((row for row in rows if row['date'] is None), None)
+            if totals is not None:
+                totals = {k: v for k, v in totals.items() if k != 'date'}
+            return {'series': series, 'totals': totals}
         except Exception as e:
-            logger.error(f"Error getting channel activity: {e}")
+            logger.exception("get_channel_activity failed")
             raise
     
     def search_messages(self, query: str, limit: int = 50) -> List[Dict[str, Any]]:
         """Search messages containing specific keywords"""
+        # Full-text search against the stored tsvector + GIN index
+        # (created by scripts/db_migrations.py) instead of a sequential
+        # LIKE scan; the trigram index covers sub-token fallback queries.
         search_query = """
-            SELECT 
+            SELECT
+                fm.message_id,
+                dc.channel_name,
+                fm.message_date,
+                fm.view_count,
+                fm.forward_count,
+                fm.reply_count,
+                fm.engagement_score,
+                fm.reach_category,
+                tm.text as message_text,
+                fm.has_media
+            FROM analytics.fct_messages fm
+            JOIN analytics.dim_channels dc ON fm.channel_key = dc.channel_key
+            JOIN raw.telegram_messages tm ON fm.message_id = tm.id
+            WHERE tm.tsv @@ plainto_tsquery('simple', %s)
+            ORDER BY ts_rank_cd(tm.tsv, plainto_tsquery('simple', %s)) DESC,
+                     fm.engagement_score DESC, fm.view_count DESC
+            LIMIT %s
+        """
+        fallback_query = """
+            SELECT
                 fm.message_id,
                 dc.channel_name,
                 fm.message_date,
@@ -83,106 +142,227 @@ class AnalyticsCRUD:
             LIMIT %s
         """
         try:
-            search_term = f"%{query}%"
-            return self.db.execute_query(search_query, (search_term, limit))
+            results = self.db.execute_query(search_query, (query, query, limit))
+            if not results:
+                # Sub-token substrings never match a tsquery; fall back to
+                # the trigram-indexed LIKE scan
+                results = self.db.execute_query(fallback_query, (f"%{query}%", limit))
+            return results
         except Exception as e:
-            logger.error(f"Error searching messages: {e}")
+            logger.exception("search_messages failed")
             raise
     
+    def search_messages_stream(self, query: str, limit: int = 50):
+        """Stream messages matching a full-text query row by row"""
+        search_query = """
+            SELECT
+                fm.message_id,
+                dc.channel_name,
+                fm.message_date,
+                fm.view_count,
+                fm.forward_count,
+                fm.reply_count,
+                fm.engagement_score,
+                fm.reach_category,
+                tm.text as message_text,
+                fm.has_media
+            FROM analytics.fct_messages fm
+            JOIN analytics.dim_channels dc ON fm.channel_key = dc.channel_key
+            JOIN raw.telegram_messages tm ON fm.message_id = tm.id
+            WHERE tm.tsv @@ plainto_tsquery('simple', %s)
+            ORDER BY ts_rank_cd(tm.tsv, plainto_tsquery('simple', %s)) DESC,
+                     fm.engagement_score DESC, fm.view_count DESC
+            LIMIT %s
+        """
+        return self.db.execute_query_stream(search_query, (query, query, limit))
+
+    @cachedmethod(attrgetter('_cache'), lock=attrgetter('_lock'))
     def get_channel_analytics(self, channel_name: str) -> Dict[str, Any]:
         """Get comprehensive channel analytics"""
+        # Single round-trip: message stats, top objects and the
+        # detection-weighted confidence are all computed in one statement
         query = """
-            SELECT 
-                dc.channel_name,
-                dc.total_messages,
-                SUM(fm.view_count) as total_views,
-                SUM(fm.forward_count) as total_forwards,
-                SUM(fm.reply_count) as total_replies,
-                AVG(fm.engagement_score) as avg_engagement_score,
-                dc.avg_views_per_message,
-                dc.overall_forward_rate,
-                dc.channel_activity_level
-            FROM analytics.dim_channels dc
-            LEFT JOIN analytics.fct_messages fm ON dc.channel_key = fm.channel_key
-            WHERE dc.channel_name = %s
-            GROUP BY dc.channel_key, dc.channel_name, dc.total_messages, 
-                     dc.avg_views_per_message, dc.overall_forward_rate, 
-                     dc.channel_activity_level
+            WITH main AS (
+                SELECT
+                    dc.channel_name,
+                    dc.total_messages,
+                    SUM(fm.view_count) as total_views,
+                    SUM(fm.forward_count) as total_forwards,
+                    SUM(fm.reply_count) as total_replies,
+                    AVG(fm.engagement_score) as avg_engagement_score,
+                    dc.avg_views_per_message,
+                    dc.overall_forward_rate,
+                    dc.channel_activity_level
+                FROM analytics.dim_channels dc
+                LEFT JOIN analytics.fct_messages fm ON dc.channel_key = fm.channel_key
+                WHERE dc.channel_name = %s
+                GROUP BY dc.channel_key, dc.channel_name, dc.total_messages,
+                         dc.avg_views_per_message, dc.overall_forward_rate,
+                         dc.channel_activity_level
+            ),
+            objs AS (
+                SELECT
+                    fid.detected_object_class,
+                    COUNT(*) as detection_count,
+                    AVG(fid.confidence_score) as avg_confidence
+                FROM analytics.fct_image_detections fid
+                JOIN analytics.dim_channels dc ON fid.channel_key = dc.channel_key
+                WHERE dc.channel_name = %s
+                GROUP BY fid.detected_object_class
+                ORDER BY detection_count DESC
+                LIMIT 5
+            ),
+            agg AS (
+                SELECT
+                    COALESCE(array_agg(detected_object_class ORDER BY detection_count DESC), '{}') as top_detected_objects,
+                    COALESCE(SUM(detection_count), 0) as detection_count,
+                    COALESCE(SUM(avg_confidence * detection_count) / NULLIF(SUM(detection_count), 0), 0.0) as avg_confidence
+                FROM objs
+            )
+            SELECT main.*, agg.top_detected_objects, agg.detection_count, agg.avg_confidence
+            FROM main, agg
         """
-        
-        # Get top objects for this channel
-        objects_query = """
-            SELECT 
-                fid.detected_object_class,
-                COUNT(*) as detection_count,
-                AVG(fid.confidence_score) as avg_confidence
-            FROM analytics.fct_image_detections fid
-            JOIN analytics.dim_channels dc ON fid.channel_key = dc.channel_key
-            WHERE dc.channel_name = %s
-            GROUP BY fid.detected_object_class
-            ORDER BY detection_count DESC
-            LIMIT 5
-        """
-        
+
         try:
-            # Get main analytics
-            main_result = self.db.execute_single_query(query, (channel_name,))
-            if not main_result:
-                return None
-            
-            # Get object detections
-            objects_result = self.db.execute_query(objects_query, (channel_name,))
-            
-            # Combine results
-            main_result['top_detected_objects'] = [obj['detected_object_class'] for obj in objects_result]
-            main_result['detection_count'] = sum(obj['detection_count'] for obj in objects_result)
-            main_result['avg_confidence'] = sum(obj['avg_confidence'] for obj in objects_result) / len(objects_result) if objects_result else 0.0
-            
-            return main_result
+            return self.db.execute_single_query(query, (channel_name, channel_name))
         except Exception as e:
-            logger.error(f"Error getting channel analytics: {e}")
+            logger.exception("get_channel_analytics failed")
             raise
     
+    def get_channels_analytics_batch(self, channel_names: List[str]) -> Dict[str, Dict[str, Any]]:
+        """Get comprehensive analytics for many channels in one round-trip
+
+        Preferred over per-channel get_channel_analytics calls for
+        multi-channel dashboards: the whole batch costs a single query
+        instead of two per channel.
+        """
+        query = """
+            WITH main AS (
+                SELECT
+                    dc.channel_name,
+                    dc.total_messages,
+                    SUM(fm.view_count) as total_views,
+                    SUM(fm.forward_count) as total_forwards,
+                    SUM(fm.reply_count) as total_replies,
+                    AVG(fm.engagement_score) as avg_engagement_score,
+                    dc.avg_views_per_message,
+                    dc.overall_forward_rate,
+                    dc.channel_activity_level
+                FROM analytics.dim_channels dc
+                LEFT JOIN analytics.fct_messages fm ON dc.channel_key = fm.channel_key
+                WHERE dc.channel_name = ANY(%s)
+                GROUP BY dc.channel_key, dc.channel_name, dc.total_messages,
+                         dc.avg_views_per_message, dc.overall_forward_rate,
+                         dc.channel_activity_level
+            ),
+            objs AS (
+                SELECT
+                    dc.channel_name,
+                    fid.detected_object_class,
+                    COUNT(*) as detection_count,
+                    AVG(fid.confidence_score) as avg_confidence,
+                    ROW_NUMBER() OVER (
+                        PARTITION BY dc.channel_name ORDER BY COUNT(*) DESC
+                    ) as rn
+                FROM analytics.fct_image_detections fid
+                JOIN analytics.dim_channels dc ON fid.channel_key = dc.channel_key
+                WHERE dc.channel_name = ANY(%s)
+                GROUP BY dc.channel_name, fid.detected_object_class
+            ),
+            agg AS (
+                SELECT
+                    channel_name,
+                    array_agg(detected_object_class ORDER BY detection_count DESC) as top_detected_objects,
+                    SUM(detection_count) as detection_count,
+                    SUM(avg_confidence * detection_count) / NULLIF(SUM(detection_count), 0) as avg_confidence
+                FROM objs
+                WHERE rn <= 5
+                GROUP BY channel_name
+            )
+            SELECT
+                main.*,
+                COALESCE(agg.top_detected_objects, '{}') as top_detected_objects,
+                COALESCE(agg.detection_count, 0) as detection_count,
+                COALESCE(agg.avg_confidence, 0.0) as avg_confidence
+            FROM main
+            LEFT JOIN agg USING (channel_name)
+        """
+        try:
+            # psycopg2 adapts the Python list into a PG array for ANY()
+            rows = self.db.execute_query(query, (channel_names, channel_names))
+            return {row['channel_name']: row for row in rows}
+        except Exception as e:
+            logger.exception("get_channels_analytics_batch failed")
+            raise
+
+    @cachedmethod(attrgetter('_cache'), lock=attrgetter('_lock'))
     def get_top_channels(self, limit: int = 10) -> List[Dict[str, Any]]:
         """Get top channels by activity"""
         query = """
-            SELECT 
+            SELECT
                 channel_name,
                 total_messages,
                 avg_views_per_message,
                 overall_forward_rate,
-                channel_activity_level
-            FROM analytics.dim_channels
+                channel_activity_level,
+                updated_at
+            FROM analytics.mv_channel_summary
             ORDER BY total_messages DESC
             LIMIT %s
         """
         try:
             return self.db.execute_query(query, (limit,))
         except Exception as e:
-            logger.error(f"Error getting top channels: {e}")
+            logger.exception("get_top_channels failed")
             raise
     
-    def get_engagement_metrics(self, days: int = 30) -> List[Dict[str, Any]]:
+    # Threshold baked into mv_engagement_daily and the partial index
+    HIGH_ENGAGEMENT_THRESHOLD = 0.5
+
+    @cachedmethod(attrgetter('_cache'), lock=attrgetter('_lock'))
+    def get_engagement_metrics(self, days: int = 30,
+                               threshold: float = HIGH_ENGAGEMENT_THRESHOLD) -> List[Dict[str, Any]]:
         """Get engagement metrics over time"""
-        query = """
-            SELECT 
+        # The incrementally maintained rollup covers the default
+        # threshold; any other threshold aggregates the facts live
+        rollup_query = """
+            SELECT
+                date_day as date,
+                SUM(message_count) as total_messages,
+                SUM(sum_views) as total_views,
+                SUM(sum_forwards) as total_forwards,
+                SUM(sum_replies) as total_replies,
+                SUM(sum_engagement) / NULLIF(SUM(message_count), 0) as avg_engagement_score,
+                SUM(n_high) as high_engagement_messages
+            FROM analytics.rollup_engagement_daily
+            WHERE date_day >= CURRENT_DATE - make_interval(days => %s)
+            GROUP BY date_day
+            ORDER BY date_day DESC
+        """
+        live_query = """
+            SELECT
                 dd.date_day as date,
                 COUNT(fm.message_id) as total_messages,
                 SUM(fm.view_count) as total_views,
                 SUM(fm.forward_count) as total_forwards,
                 SUM(fm.reply_count) as total_replies,
                 AVG(fm.engagement_score) as avg_engagement_score,
-                COUNT(CASE WHEN fm.engagement_score > 0.5 THEN 1 END) as high_engagement_messages
+                COUNT(*) FILTER (WHERE fm.engagement_score > %s) as high_engagement_messages
             FROM analytics.fct_messages fm
             JOIN analytics.dim_dates dd ON fm.date_key = dd.date_key
-            WHERE dd.date_day >= CURRENT_DATE - INTERVAL '%s days'
+            WHERE dd.date_day >= CURRENT_DATE - make_interval(days => %s)
+            AND fm.message_date >= CURRENT_DATE - make_interval(days => %s)
             GROUP BY dd.date_day
             ORDER BY dd.date_day DESC
         """
         try:
-            return self.db.execute_query(query, (days,))
+            if threshold == self.HIGH_ENGAGEMENT_THRESHOLD:
+                return self.db.execute_query(rollup_query, (days,))
+            # The fact-side message_date predicate lets the planner prune
+            # the monthly partitions
+            return self.db.execute_query(live_query, (threshold, days, days))
         except Exception as e:
-            logger.error(f"Error getting engagement metrics: {e}")
+            logger.exception("get_engagement_metrics failed")
             raise
     
     def get_object_detections(self, object_class: Optional[str] = None, 
@@ -223,24 +403,119 @@ class AnalyticsCRUD:
         try:
             return self.db.execute_query(base_query, tuple(params))
         except Exception as e:
-            logger.error(f"Error getting object detections: {e}")
+            logger.exception("get_object_detections failed")
             raise
     
+    def get_object_detections_stream(self, object_class: Optional[str] = None,
+                                     confidence_level: Optional[str] = None,
+                                     limit: int = 50):
+        """Stream object detection details row by row"""
+        base_query = """
+            SELECT
+                fid.detection_id,
+                fid.message_id,
+                dc.channel_name,
+                fid.detected_object_class,
+                fid.confidence_score,
+                fid.confidence_level,
+                fid.bbox_area,
+                fid.detection_score,
+                fid.detection_date,
+                fid.message_date,
+                fid.engagement_score
+            FROM analytics.fct_image_detections fid
+            JOIN analytics.dim_channels dc ON fid.channel_key = dc.channel_key
+            WHERE 1=1
+        """
+
+        params = []
+
+        if object_class:
+            base_query += " AND fid.detected_object_class = %s"
+            params.append(object_class)
+
+        if confidence_level:
+            base_query += " AND fid.confidence_level = %s"
+            params.append(confidence_level)
+
+        base_query += " ORDER BY fid.detection_score DESC, fid.confidence_score DESC LIMIT %s"
+        params.append(limit)
+
+        return self.db.execute_query_stream(base_query, tuple(params))
+
+    @cachedmethod(attrgetter('_cache'), lock=attrgetter('_lock'))
+    def get_detection_class_summary(self, limit: int = 20) -> List[Dict[str, Any]]:
+        """Get per-class detection counts and mean confidence
+
+        The raw (class, confidence) pairs are fetched as two columns and
+        aggregated client-side with the vectorized kernel in
+        api.aggregates rather than per-row Python loops.
+        """
+        query = """
+            SELECT
+                fid.detected_object_class,
+                fid.confidence_score
+            FROM analytics.fct_image_detections fid
+        """
+        try:
+            rows = self.db.execute_query(query)
+            if not rows:
+                return []
+
+            labels, counts, means = summarize_by_class(
+                [row['detected_object_class'] for row in rows],
+                (row['confidence_score'] for row in rows)
+            )
+            return [
+                {
+                    'object_class': str(label),
+                    'detection_count': int(count),
+                    'avg_confidence': float(mean)
+                }
+                for label, count, mean in zip(labels[:limit], counts[:limit], means[:limit])
+            ]
+        except Exception as e:
+            logger.exception("get_detection_class_summary failed")
+            raise
+
+    @cachedmethod(attrgetter('_cache'), lock=attrgetter('_lock'))
     def get_channel_list(self) -> List[Dict[str, Any]]:
         """Get list of all channels"""
         query = """
-            SELECT 
+            SELECT
                 channel_name,
                 total_messages,
                 avg_views_per_message,
                 channel_activity_level
-            FROM analytics.dim_channels
+            FROM analytics.mv_channel_summary
             ORDER BY channel_name
         """
         try:
             return self.db.execute_query(query)
         except Exception as e:
-            logger.error(f"Error getting channel list: {e}")
+            logger.exception("get_channel_list failed")
+            raise
+
+    def refresh_materialized_views(self):
+        """Refresh the materialized views backing the aggregate endpoints"""
+        try:
+            with self.db.acquire() as conn:
+                conn.autocommit = True
+                try:
+                    with conn.cursor() as cursor:
+                        for view in MATERIALIZED_VIEWS:
+                            cursor.execute(
+                                f"REFRESH MATERIALIZED VIEW CONCURRENTLY analytics.{view}"
+                            )
+                finally:
+                    # Always restore before the connection returns to
+                    # the pool: putconn doesn't reset autocommit, and a
+                    # leaked autocommit connection breaks named-cursor
+                    # streaming queries for whoever draws it next
+                    conn.autocommit = False
+            logger.info("Refreshed %d materialized views", len(MATERIALIZED_VIEWS))
+        except Exception as e:
+            logger.exception("refresh_materialized_views failed")
             raise
 
 # Global CRUD instance
@@ -2,8 +2,11 @@
 Database configuration and connection management
 """
 import os
+import uuid
 import psycopg2
+from psycopg2.pool import ThreadedConnectionPool
 from psycopg2.extras import RealDictCursor
+from contextlib import contextmanager
 from typing import Optional
 import logging
 
@@ -20,55 +23,120 @@ DB_CONFIG = {
     'password': os.getenv('DB_PASSWORD', 'your_secure_password')
 }
 
+# Connection pool sizing
+DB_POOL_MIN = int(os.getenv('DB_POOL_MIN', 2))
+DB_POOL_MAX = int(os.getenv('DB_POOL_MAX', 20))
+
 class DatabaseManager:
-    """Database connection manager with connection pooling"""
-    
+    """Database connection manager backed by a thread-safe connection pool"""
+
     def __init__(self):
-        self.connection = None
-    
-    def get_connection(self):
-        """Get database connection"""
+        self.pool = None
+
+    def get_pool(self):
+        """Get (or lazily create) the connection pool"""
         try:
-            if self.connection is None or self.connection.closed:
-                self.connection = psycopg2.connect(**DB_CONFIG)
-                logger.info("✅ Database connection established")
-            return self.connection
+            if self.pool is None or self.pool.closed:
+                self.pool = ThreadedConnectionPool(
+                    minconn=DB_POOL_MIN,
+                    maxconn=DB_POOL_MAX,
+                    **DB_CONFIG
+                )
+                logger.info("✅ Database connection pool established")
+            return self.pool
         except Exception as e:
-            logger.error(f"❌ Database connection failed: {e}")
+            logger.exception("❌ Database connection failed")
             raise
-    
+
+    @contextmanager
+    def acquire(self):
+        """Acquire a connection from the pool and release it when done"""
+        pool = self.get_pool()
+        conn = pool.getconn()
+        try:
+            self._tune_session(conn)
+            yield conn
+        finally:
+            pool.putconn(conn)
+
+    @staticmethod
+    def _tune_session(conn):
+        """Apply analytics session settings once per pooled connection
+
+        The star-schema joins should use hash joins over the declared
+        dim PKs/FKs, so nested loops are disabled and the collapse
+        limits raised to let the planner reorder the full join tree.
+        """
+        if getattr(conn, '_session_tuned', False):
+            return
+        with conn.cursor() as cursor:
+            cursor.execute(
+                "SET enable_nestloop = off; "
+                "SET join_collapse_limit = 16; "
+                "SET from_collapse_limit = 16;"
+            )
+        conn.commit()
+        conn._session_tuned = True
+
     def close_connection(self):
-        """Close database connection"""
-        if self.connection and not self.connection.closed:
-            self.connection.close()
-            logger.info("🔒 Database connection closed")
-    
+        """Close all pooled database connections"""
+        if self.pool and not self.pool.closed:
+            self.pool.closeall()
+            logger.info("🔒 Database connection pool closed")
+
     def execute_query(self, query: str, params: Optional[tuple] = None):
         """Execute query and return results"""
         try:
-            conn = self.get_connection()
-            with conn.cursor(cursor_factory=RealDictCursor) as cursor:
-                cursor.execute(query, params or ())
-                if cursor.description:
-                    results = cursor.fetchall()
-                    return [dict(row) for row in results]
-                return []
+            with self.acquire() as conn:
+                with conn.cursor(cursor_factory=RealDictCursor) as cursor:
+                    cursor.execute(query, params or ())
+                    if cursor.description:
+                        # RealDictCursor already yields dict rows; avoid
+                        # copying each one into a fresh dict
+                        return cursor.fetchall()
+                    return []
         except Exception as e:
-            logger.error(f"❌ Query execution failed: {e}")
+            logger.exception("❌ Query execution failed")
             raise
-    
+
+    def execute_query_stream(self, query: str, params: Optional[tuple] = None,
+                             itersize: int = 500):
+        """Execute query and yield rows from a server-side cursor
+
+        Rows are fetched in batches of `itersize` instead of being
+        materialized with fetchall(), keeping peak memory flat for
+        large result sets.
+        """
+        with self.acquire() as conn:
+            cursor = conn.cursor(
+                f"stream_{uuid.uuid4().hex}",
+                cursor_factory=RealDictCursor
+            )
+            cursor.itersize = itersize
+            try:
+                cursor.execute(query, params or ())
+                for row in cursor:
+                    yield row
+            except Exception as e:
+                logger.exception("❌ Streaming query failed")
+                raise
+            finally:
+                cursor.close()
+                # End the implicit read transaction before returning the
+                # connection to the pool
+                conn.rollback()
+
     def execute_single_query(self, query: str, params: Optional[tuple] = None):
         """Execute query and return single result"""
         try:
-            conn = self.get_connection()
-            with conn.cursor(cursor_factory=RealDictCursor) as cursor:
-                cursor.execute(query, params or ())
-                if cursor.description:
-                    result = cursor.fetchone()
-                    return dict(result) if result else None
-                return None
+            with self.acquire() as conn:
+                with conn.cursor(cursor_factory=RealDictCursor) as cursor:
+                    cursor.execute(query, params or ())
+                    if cursor.description:
+                        return cursor.fetchone()
+                    return None
         except Exception as e:
-            logger.error(f"❌ Single query execution failed: {e}")
+            logger.exception("❌ Single query execution failed")
             raise
 
 # Global database manager instance
@@ -1,11 +1,17 @@
 """
 FastAPI Analytical API for Telegram Data Analytics
 """
-from fastapi import FastAPI, HTTPException, Query, Path, Depends
+from fastapi import FastAPI, HTTPException, Query, Path, Depends, Request, Response
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.responses import JSONResponse
+from starlette.middleware.gzip import GZipMiddleware
+from fastapi.responses import ORJSONResponse, StreamingResponse
+from fastapi.concurrency import run_in_threadpool
 from typing import List, Optional
+import asyncio
+import hashlib
 import logging
+import orjson
+import os
 from datetime import datetime
 
 from .database import db_manager
@@ -22,7 +28,8 @@ app = FastAPI(
     description="Analytical API for Telegram channel data with YOLO object detection insights",
     version="1.0.0",
     docs_url="/docs",
-    redoc_url="/redoc"
+    redoc_url="/redoc",
+    default_response_class=ORJSONResponse
 )
 
 # Add CORS middleware
@@ -34,36 +41,102 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+# Compress JSON payloads above 1 KiB
+app.add_middleware(GZipMiddleware, minimum_size=1024)
+
+# Prometheus /metrics endpoint (request latency/count histograms)
+try:
+    from prometheus_fastapi_instrumentator import Instrumentator
+    Instrumentator().instrument(app).expose(app, include_in_schema=False)
+    logger.info("✅ Prometheus /metrics endpoint enabled")
+except ImportError:
+    logger.info("prometheus-fastapi-instrumentator not installed; /metrics disabled")
+
+# Materialized view refresh interval (seconds)
+MV_REFRESH_INTERVAL = int(os.getenv("MV_REFRESH_INTERVAL", 900))
+
+# Client-side cache lifetime, matching the CRUD TTL cache
+CACHE_CONTROL_HEADER = "max-age=60"
+
+# Channel list blob refresh interval (seconds)
+CHANNEL_LIST_REFRESH_INTERVAL = int(os.getenv("CHANNEL_LIST_REFRESH_INTERVAL", 3600))
+
+def make_etag(*parts) -> str:
+    """Build a weak ETag from a cheap fingerprint of the result set"""
+    fingerprint = ":".join(str(part) for part in parts)
+    return 'W/"' + hashlib.blake2s(fingerprint.encode()).hexdigest()[:16] + '"'
+
+def not_modified(request: Request, response: Response, etag: str) -> bool:
+    """Attach the ETag and report whether the client already has it"""
+    response.headers["ETag"] = etag
+    return request.headers.get("If-None-Match") == etag
+
+async def _rebuild_channel_list_blob():
+    """Serialize the channel list once so the endpoint can serve raw bytes"""
+    channels = await run_in_threadpool(analytics_crud.get_channel_list)
+    app.state.channel_list_blob = orjson.dumps({
+        "channels": [channel["channel_name"] for channel in channels],
+        "total_count": len(channels)
+    })
+
+async def _refresh_channel_list_loop():
+    """Periodically rebuild the pre-serialized channel list blob"""
+    while True:
+        try:
+            await _rebuild_channel_list_blob()
+        except Exception as e:
+            logger.exception("Channel list refresh failed")
+        await asyncio.sleep(CHANNEL_LIST_REFRESH_INTERVAL)
+
+async def _refresh_materialized_views_loop():
+    """Periodically refresh the materialized views backing aggregate endpoints"""
+    while True:
+        await asyncio.sleep(MV_REFRESH_INTERVAL)
+        try:
+            await asyncio.to_thread(analytics_crud.refresh_materialized_views)
+        except Exception as e:
+            logger.exception("Materialized view refresh failed")
+
+@app.on_event("startup")
+async def start_background_tasks():
+    """Start background maintenance tasks"""
+    app.state.channel_list_blob = None
+    asyncio.create_task(_refresh_channel_list_loop())
+    asyncio.create_task(_refresh_materialized_views_loop())
+
 # Exception handlers
 @app.exception_handler(Exception)
 async def general_exception_handler(request, exc):
-    logger.error(f"Unhandled exception: {exc}")
-    return JSONResponse(
+    logger.exception("Unhandled exception")
+    return ORJSONResponse(
         status_code=500,
-        content=ErrorResponse(
-            message="Internal server error",
-            error_code="INTERNAL_ERROR"
-        ).dict()
+        content={
+            "status": "error",
+            "message": "Internal server error",
+            "error_code": "INTERNAL_ERROR",
+            "timestamp": datetime.now()
+        }
     )
 
 @app.exception_handler(HTTPException)
 async def http_exception_handler(request, exc):
-    return JSONResponse(
+    return ORJSONResponse(
         status_code=exc.status_code,
-        content=ErrorResponse(
-            message=exc.detail,
-            error_code=f"HTTP_{exc.status_code}"
-        ).dict()
+        content={
+            "status": "error",
+            "message": exc.detail,
+            "error_code": f"HTTP_{exc.status_code}",
+            "timestamp": datetime.now()
+        }
     )
 
 # Dependency for database connection
 async def get_db():
     """Database dependency"""
     try:
-        db_manager.get_connection()
         yield db_manager
     except Exception as e:
-        logger.error(f"Database connection error: {e}")
+        logger.exception("Database connection error")
         raise HTTPException(status_code=500, detail="Database connection failed")
 
 # Health check endpoint
@@ -72,12 +145,12 @@ async def health_check():
     """Health check endpoint"""
     try:
         # Test database connection
-        db_manager.execute_query("SELECT 1")
+        await run_in_threadpool(db_manager.execute_query, "SELECT 1")
         return BaseResponse(
             message="API is healthy and database is accessible"
         )
     except Exception as e:
-        logger.error(f"Health check failed: {e}")
+        logger.exception("Health check failed")
         raise HTTPException(status_code=500, detail="Health check failed")
 
 # Root endpoint
@@ -92,6 +165,8 @@ async def root():
 
 @app.get("/api/reports/top-products", response_model=TopProductsResponse)
 async def get_top_products(
+    request: Request,
+    response: Response,
     limit: int = Query(10, ge=1, le=100, description="Number of top products to return"),
     db: db_manager = Depends(get_db)
 ):
@@ -103,16 +178,22 @@ async def get_top_products(
     in the telegram channel images.
     """
     try:
-        products = analytics_crud.get_top_products(limit)
-        
+        products = await run_in_threadpool(analytics_crud.get_top_products, limit)
+        response.headers["Cache-Control"] = CACHE_CONTROL_HEADER
+
+        etag = make_etag(len(products), products[0]["updated_at"] if products else None)
+        if not_modified(request, response, etag):
+            return Response(status_code=304)
+
         return TopProductsResponse(
             data=products,
             total_records=len(products),
             limit=limit,
+            data_updated_at=products[0]["updated_at"] if products else None,
             message=f"Retrieved top {len(products)} products successfully"
         )
     except Exception as e:
-        logger.error(f"Error in get_top_products: {e}")
+        logger.exception("Error in get_top_products")
         raise HTTPException(status_code=500, detail="Failed to retrieve top products")
 
 @app.get("/api/channels/{channel_name}/activity", response_model=ChannelActivityResponse)
@@ -128,26 +209,28 @@ async def get_channel_activity(
     message count, views, forwards, and engagement scores.
     """
     try:
-        activity = analytics_crud.get_channel_activity(channel_name, days)
-        
-        if not activity:
+        activity = await run_in_threadpool(analytics_crud.get_channel_activity, channel_name, days)
+        series = activity['series']
+
+        if not series:
             raise HTTPException(
-                status_code=404, 
+                status_code=404,
                 detail=f"Channel '{channel_name}' not found or has no activity"
             )
-        
+
         return ChannelActivityResponse(
-            data=activity,
-            total_records=len(activity),
-            message=f"Retrieved {len(activity)} days of activity for {channel_name}"
+            data=series,
+            totals=activity['totals'],
+            total_records=len(series),
+            message=f"Retrieved {len(series)} days of activity for {channel_name}"
         )
     except HTTPException:
         raise
     except Exception as e:
-        logger.error(f"Error in get_channel_activity: {e}")
+        logger.exception("Error in get_channel_activity")
         raise HTTPException(status_code=500, detail="Failed to retrieve channel activity")
 
-@app.get("/api/search/messages", response_model=MessageSearchResponse)
+@app.get("/api/search/messages")
 async def search_messages(
     query: str = Query(..., min_length=1, description="Search query for message content"),
     limit: int = Query(50, ge=1, le=200, description="Maximum number of results to return"),
@@ -160,18 +243,40 @@ async def search_messages(
     ranked by engagement score and view count.
     """
     try:
-        messages = analytics_crud.search_messages(query, limit)
-        
-        return MessageSearchResponse(
-            data=messages,
-            total_records=len(messages),
-            query=query,
-            message=f"Found {len(messages)} messages matching '{query}'"
-        )
+        messages = await run_in_threadpool(analytics_crud.search_messages, query, limit)
+
+        # Rows come straight from the DB; skip per-row Pydantic
+        # validation and let orjson serialize the dicts directly
+        return {
+            "status": "success",
+            "message": f"Found {len(messages)} messages matching '{query}'",
+            "timestamp": datetime.now(),
+            "data": messages,
+            "total_records": len(messages),
+            "query": query
+        }
     except Exception as e:
-        logger.error(f"Error in search_messages: {e}")
+        logger.exception("Error in search_messages")
         raise HTTPException(status_code=500, detail="Failed to search messages")
 
+@app.get("/api/search/messages/stream")
+async def search_messages_stream(
+    query: str = Query(..., min_length=1, description="Search query for message content"),
+    limit: int = Query(50, ge=1, le=200, description="Maximum number of results to return"),
+    db: db_manager = Depends(get_db)
+):
+    """
+    Stream search results as newline-delimited JSON.
+
+    Rows are pulled from a server-side cursor and serialized one at a
+    time, so large result sets never sit fully in memory.
+    """
+    def ndjson():
+        for row in analytics_crud.search_messages_stream(query, limit):
+            yield orjson.dumps(row, default=str) + b"\n"
+
+    return StreamingResponse(ndjson(), media_type="application/x-ndjson")
+
 @app.get("/api/channels/{channel_name}/analytics", response_model=ChannelAnalyticsResponse)
 async def get_channel_analytics(
     channel_name: str = Path(..., description="Channel name to get analytics for"),
@@ -184,7 +289,7 @@ async def get_channel_analytics(
     engagement metrics, and top detected objects for the channel.
     """
     try:
-        analytics = analytics_crud.get_channel_analytics(channel_name)
+        analytics = await run_in_threadpool(analytics_crud.get_channel_analytics, channel_name)
         
         if not analytics:
             raise HTTPException(
@@ -199,11 +304,37 @@ async def get_channel_analytics(
     except HTTPException:
         raise
     except Exception as e:
-        logger.error(f"Error in get_channel_analytics: {e}")
+        logger.exception("Error in get_channel_analytics")
         raise HTTPException(status_code=500, detail="Failed to retrieve channel analytics")
 
+@app.post("/api/channels/analytics:batch", response_model=ChannelBatchAnalyticsResponse)
+async def get_channels_analytics_batch(
+    request: ChannelBatchRequest,
+    db: db_manager = Depends(get_db)
+):
+    """
+    Get comprehensive analytics for multiple channels at once.
+
+    This is the preferred path for multi-channel dashboards: the whole
+    batch is answered with a single database query instead of two
+    queries per channel.
+    """
+    try:
+        analytics = await run_in_threadpool(analytics_crud.get_channels_analytics_batch, request.names)
+
+        return ChannelBatchAnalyticsResponse(
+            data=analytics,
+            total_records=len(analytics),
+            message=f"Retrieved analytics for {len(analytics)} channels"
+        )
+    except Exception as e:
+        logger.exception("Error in get_channels_analytics_batch")
+        raise HTTPException(status_code=500, detail="Failed to retrieve batch channel analytics")
+
 @app.get("/api/channels", response_model=TopChannelsResponse)
 async def get_channels(
+    request: Request,
+    response: Response,
     limit: int = Query(10, ge=1, le=50, description="Number of channels to return"),
     db: db_manager = Depends(get_db)
 ):
@@ -214,20 +345,29 @@ async def get_channels(
     message count and activity level.
     """
     try:
-        channels = analytics_crud.get_top_channels(limit)
-        
+        channels = await run_in_threadpool(analytics_crud.get_top_channels, limit)
+        response.headers["Cache-Control"] = CACHE_CONTROL_HEADER
+
+        etag = make_etag(len(channels), channels[0]["updated_at"] if channels else None)
+        if not_modified(request, response, etag):
+            return Response(status_code=304)
+
         return TopChannelsResponse(
             data=channels,
             total_records=len(channels),
+            data_updated_at=channels[0]["updated_at"] if channels else None,
             message=f"Retrieved {len(channels)} channels successfully"
         )
     except Exception as e:
-        logger.error(f"Error in get_channels: {e}")
+        logger.exception("Error in get_channels")
         raise HTTPException(status_code=500, detail="Failed to retrieve channels")
 
-@app.get("/api/engagement/metrics", response_model=EngagementMetricsResponse)
+@app.get("/api/engagement/metrics")
 async def get_engagement_metrics(
+    request: Request,
+    response: Response,
     days: int = Query(30, ge=1, le=365, description="Number of days to analyze"),
+    threshold: float = Query(0.5, ge=0.0, le=1.0, description="High-engagement score threshold"),
     db: db_manager = Depends(get_db)
 ):
     """
@@ -237,18 +377,32 @@ async def get_engagement_metrics(
     views, forwards, replies, and engagement scores.
     """
     try:
-        metrics = analytics_crud.get_engagement_metrics(days)
-        
-        return EngagementMetricsResponse(
+        metrics = await run_in_threadpool(analytics_crud.get_engagement_metrics, days, threshold)
+        response.headers["Cache-Control"] = CACHE_CONTROL_HEADER
+
+        # Rows are ordered date DESC and carry no updated_at column, so
+        # fingerprint the latest day plus its message count: a new day
+        # or an intra-day update both change the ETag even once the
+        # window is full and len(metrics) stops moving
+        latest = metrics[0] if metrics else {}
+        etag = make_etag(len(metrics), threshold,
+                         latest.get("date"), latest.get("total_messages"))
+        if not_modified(request, response, etag):
+            return Response(status_code=304)
+
+        # Rows are trusted DB output; model_construct skips per-row
+        # re-validation on the response path
+        return EngagementMetricsResponse.model_construct(
             data=metrics,
             total_records=len(metrics),
+            data_updated_at=metrics[0].get("updated_at") if metrics else None,
             message=f"Retrieved {len(metrics)} days of engagement metrics"
         )
     except Exception as e:
-        logger.error(f"Error in get_engagement_metrics: {e}")
+        logger.exception("Error in get_engagement_metrics")
         raise HTTPException(status_code=500, detail="Failed to retrieve engagement metrics")
 
-@app.get("/api/detections", response_model=ObjectDetectionResponse)
+@app.get("/api/detections")
 async def get_object_detections(
     object_class: Optional[str] = Query(None, description="Filter by object class"),
     confidence_level: Optional[ConfidenceLevel] = Query(None, description="Filter by confidence level"),
@@ -262,63 +416,123 @@ async def get_object_detections(
     by object class and confidence level.
     """
     try:
-        detections = analytics_crud.get_object_detections(
+        detections = await run_in_threadpool(
+            analytics_crud.get_object_detections,
             object_class=object_class,
             confidence_level=confidence_level.value if confidence_level else None,
             limit=limit
         )
         
-        return ObjectDetectionResponse(
-            data=detections,
-            total_records=len(detections),
-            message=f"Retrieved {len(detections)} object detections"
-        )
+        return {
+            "status": "success",
+            "message": f"Retrieved {len(detections)} object detections",
+            "timestamp": datetime.now(),
+            "data": detections,
+            "total_records": len(detections)
+        }
     except Exception as e:
-        logger.error(f"Error in get_object_detections: {e}")
+        logger.exception("Error in get_object_detections")
         raise HTTPException(status_code=500, detail="Failed to retrieve object detections")
 
+@app.get("/api/detections/class-summary")
+async def get_detection_class_summary(
+    limit: int = Query(20, ge=1, le=100, description="Number of classes to return"),
+    db: db_manager = Depends(get_db)
+):
+    """Get per-class detection counts and average confidence"""
+    try:
+        summary = await run_in_threadpool(analytics_crud.get_detection_class_summary, limit)
+
+        return {
+            "status": "success",
+            "message": f"Retrieved summary for {len(summary)} object classes",
+            "timestamp": datetime.now(),
+            "data": summary,
+            "total_records": len(summary)
+        }
+    except Exception as e:
+        logger.exception("Error in get_detection_class_summary")
+        raise HTTPException(status_code=500, detail="Failed to retrieve detection class summary")
+
+@app.get("/api/detections/stream")
+async def get_object_detections_stream(
+    object_class: Optional[str] = Query(None, description="Filter by object class"),
+    confidence_level: Optional[ConfidenceLevel] = Query(None, description="Filter by confidence level"),
+    limit: int = Query(50, ge=1, le=200, description="Maximum number of results to return"),
+    db: db_manager = Depends(get_db)
+):
+    """Stream object detection results as newline-delimited JSON"""
+    def ndjson():
+        rows = analytics_crud.get_object_detections_stream(
+            object_class=object_class,
+            confidence_level=confidence_level.value if confidence_level else None,
+            limit=limit
+        )
+        for row in rows:
+            yield orjson.dumps(row, default=str) + b"\n"
+
+    return StreamingResponse(ndjson(), media_type="application/x-ndjson")
+
 # Additional utility endpoints
 
 @app.get("/api/channels/list")
-async def get_channel_list(db: db_manager = Depends(get_db)):
+async def get_channel_list():
     """Get simple list of all channels"""
     try:
-        channels = analytics_crud.get_channel_list()
-        return {
-            "channels": [channel["channel_name"] for channel in channels],
-            "total_count": len(channels)
-        }
+        # Serve the pre-serialized blob; no DB or JSON work on the fast path
+        if getattr(app.state, "channel_list_blob", None) is None:
+            await _rebuild_channel_list_blob()
+        return Response(
+            content=app.state.channel_list_blob,
+            media_type="application/json",
+            headers={"Cache-Control": CACHE_CONTROL_HEADER}
+        )
     except Exception as e:
-        logger.error(f"Error in get_channel_list: {e}")
+        logger.exception("Error in get_channel_list")
         raise HTTPException(status_code=500, detail="Failed to retrieve channel list")
 
+@app.post("/api/channels/list:refresh", response_model=BaseResponse)
+async def refresh_channel_list():
+    """Force a rebuild of the cached channel list (run after ingestion)"""
+    try:
+        await _rebuild_channel_list_blob()
+        return BaseResponse(message="Channel list cache refreshed")
+    except Exception as e:
+        logger.exception("Error in refresh_channel_list")
+        raise HTTPException(status_code=500, detail="Failed to refresh channel list")
+
 @app.get("/api/stats/summary")
-async def get_summary_stats(db: db_manager = Depends(get_db)):
+async def get_summary_stats(request: Request, response: Response,
+                            db: db_manager = Depends(get_db)):
     """Get summary statistics for the entire dataset"""
     try:
-        # Get overall statistics
+        # Get overall statistics (precomputed by the materialized view)
         stats_query = """
-            SELECT 
-                COUNT(DISTINCT dc.channel_name) as total_channels,
-                COUNT(fm.message_id) as total_messages,
-                SUM(fm.view_count) as total_views,
-                SUM(fm.forward_count) as total_forwards,
-                AVG(fm.engagement_score) as avg_engagement_score,
-                COUNT(DISTINCT fid.detected_object_class) as unique_objects_detected,
-                COUNT(fid.detection_id) as total_detections
-            FROM analytics.fct_messages fm
-            JOIN analytics.dim_channels dc ON fm.channel_key = dc.channel_key
-            LEFT JOIN analytics.fct_image_detections fid ON fm.message_id = fid.message_id
+            SELECT
+                total_channels,
+                total_messages,
+                total_views,
+                total_forwards,
+                avg_engagement_score,
+                unique_objects_detected,
+                total_detections,
+                updated_at
+            FROM analytics.mv_summary_stats
         """
         
-        stats = db_manager.execute_single_query(stats_query)
-        
+        stats = await run_in_threadpool(db_manager.execute_single_query, stats_query)
+
+        # Key the ETag on the materialized view refresh timestamp
+        etag = make_etag(stats["updated_at"] if stats else None)
+        if not_modified(request, response, etag):
+            return Response(status_code=304)
+
         return {
             "summary": stats,
             "message": "Summary statistics retrieved successfully"
         }
     except Exception as e:
-        logger.error(f"Error in get_summary_stats: {e}")
+        logger.exception("Error in get_summary_stats")
         raise HTTPException(status_code=500, detail="Failed to retrieve summary statistics")
 
 if __name__ == "__main__":
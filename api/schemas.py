@@ -44,6 +44,8 @@ class BaseResponse(BaseModel):
     status: str = "success"
     message: str = "Request processed successfully"
     timestamp: datetime = Field(default_factory=datetime.now)
+    # When the underlying materialized view was last refreshed (None for live queries)
+    data_updated_at: Optional[datetime] = None
 
 # Channel models
 class ChannelInfo(BaseModel):
@@ -63,9 +65,18 @@ class ChannelActivity(BaseModel):
     total_forwards: int
     avg_engagement_score: float
 
+class ChannelActivityTotals(BaseModel):
+    """Roll-up totals across the requested activity window"""
+    channel_name: str
+    message_count: int
+    total_views: int
+    total_forwards: int
+    avg_engagement_score: float
+
 class ChannelActivityResponse(BaseResponse):
     """Channel activity response"""
     data: List[ChannelActivity]
+    totals: Optional[ChannelActivityTotals] = None
     total_records: int
 
 # Message models
@@ -142,6 +153,15 @@ class ChannelAnalyticsResponse(BaseResponse):
     """Channel analytics response"""
     data: ChannelAnalytics
 
+class ChannelBatchRequest(BaseModel):
+    """Request body for batch channel analytics"""
+    names: List[str] = Field(..., min_length=1, max_length=50)
+
+class ChannelBatchAnalyticsResponse(BaseResponse):
+    """Batch channel analytics response keyed by channel name"""
+    data: Dict[str, ChannelAnalytics]
+    total_records: int
+
 class DateRange(BaseModel):
     """Date range for filtering"""
     start_date: Optional[datetime] = None
@@ -9,7 +9,7 @@ project_root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
 if project_root not in sys.path:
     sys.path.insert(0, project_root)
 
-from dagster import Definitions
+from dagster import Definitions, multiprocess_executor
 
 # Import all assets with absolute imports
 from dagster_pipeline.assets.telegram_data_assets import (
@@ -17,14 +17,10 @@ from dagster_pipeline.assets.telegram_data_assets import (
     telegram_images,
     telegram_data_quality
 )
-from dagster_pipeline.assets.dbt_assets import (
-    dbt_staging_models,
-    dbt_dimension_tables,
-    dbt_fact_tables,
-    dbt_tests
-)
+from dagster_pipeline.assets.dbt_assets import dbt_build
 from dagster_pipeline.assets.yolo_assets import (
     yolo_object_detection,
+    yolo_channel_detection,
     yolo_dbt_models,
     yolo_data_quality
 )
@@ -54,13 +50,11 @@ all_assets = [
     telegram_data_quality,
     
     # dbt assets
-    dbt_staging_models,
-    dbt_dimension_tables,
-    dbt_fact_tables,
-    dbt_tests,
+    dbt_build,
     
     # YOLO assets
     yolo_object_detection,
+    yolo_channel_detection,
     yolo_dbt_models,
     yolo_data_quality,
     
@@ -79,9 +73,14 @@ all_resources = {
 }
 
 # Create Dagster definitions
+# Independent assets (telegram images, dbt dims vs facts once staged,
+# yolo vs api checks) run concurrently up to 8 subprocesses; within a
+# process the module-level dbtRunner keeps the manifest/adapter warm,
+# so dbt steps skip repeated cold starts.
 defs = Definitions(
     assets=all_assets,
     resources=all_resources,
     jobs=ALL_JOBS,
     schedules=ALL_SCHEDULES,
+    executor=multiprocess_executor.configured({"max_concurrent": 8}),
 )
@@ -2,264 +2,237 @@
 dbt Transformation Assets for Dagster Pipeline
 """
 import os
-from dagster import asset, get_dagster_logger, MetadataValue, MaterializeResult
+from dagster import asset, get_dagster_logger, MetadataValue, MaterializeResult, AssetObservation
 from dagster import AssetExecutionContext
 import subprocess
-import json
-from typing import Dict, Any
+import collections
+from types import SimpleNamespace
 
-@asset(
-    description="dbt staging models for telegram data",
-    compute_kind="dbt",
-    group_name="dbt_transformations",
-    deps=["raw_telegram_messages"]
-)
-def dbt_staging_models(context: AssetExecutionContext) -> MaterializeResult:
-    """Run dbt staging models"""
-    logger = get_dagster_logger()
-    
-    try:
-        # Change to dbt project directory
-        dbt_dir = os.path.join(os.getcwd(), "telegram_analytics")
-        
-        logger.info("🔧 Running dbt staging models")
-        result = subprocess.run(
-            "dbt run --select staging",
-            shell=True,
-            cwd=dbt_dir,
-            capture_output=True,
-            text=True,
-            timeout=600
+from ..resources import pg_conn
+
+# dbt project location, resolved once at import time
+DBT_PROJECT_DIR = os.path.join(os.getcwd(), "telegram_analytics")
+
+# The dim/fact row counts are observability metadata only, so by
+# default they come from pg_class.reltuples (an O(1) catalog lookup
+# kept fresh by the marts ANALYZE post-hook) instead of a full
+# COUNT(*) scan. Set DBT_EXACT_COUNTS=true to force exact counts.
+EXACT_COUNTS = os.getenv("DBT_EXACT_COUNTS", "false").lower() == "true"
+
+def _table_counts(cur, tables):
+    """Fetch row counts for analytics tables in one round-trip"""
+    if EXACT_COUNTS:
+        sql = " UNION ALL ".join(
+            f"SELECT '{table}', COUNT(*) FROM analytics.{table}"
+            for table in tables
         )
-        
-        if result.returncode == 0:
-            logger.info("✅ dbt staging models completed successfully")
-            
-            # Extract model count from output
-            output_lines = result.stdout.split('\n')
-            success_count = 0
-            for line in output_lines:
-                if "OK created" in line or "OK view" in line:
-                    success_count += 1
-            
-            return MaterializeResult(
-                metadata={
-                    "models_built": MetadataValue.int(success_count),
-                    "status": MetadataValue.text("success"),
-                    "dbt_output": MetadataValue.text(result.stdout[-1000:])  # Last 1000 chars
-                }
-            )
-        else:
-            logger.error(f"❌ dbt staging models failed: {result.stderr}")
-            return MaterializeResult(
-                metadata={
-                    "status": MetadataValue.text("failed"),
-                    "error": MetadataValue.text(result.stderr),
-                    "dbt_output": MetadataValue.text(result.stdout)
-                }
-            )
-            
-    except Exception as e:
-        logger.error(f"❌ Error running dbt staging models: {e}")
-        return MaterializeResult(
-            metadata={
-                "status": MetadataValue.text("error"),
-                "error": MetadataValue.text(str(e))
-            }
+    else:
+        sql = " UNION ALL ".join(
+            f"SELECT '{table}', reltuples::bigint FROM pg_class "
+            f"WHERE oid = 'analytics.{table}'::regclass"
+            for table in tables
         )
+    cur.execute(sql)
+    return dict(cur.fetchall())
 
-@asset(
-    description="dbt dimension tables",
-    compute_kind="dbt",
-    group_name="dbt_transformations",
-    deps=[dbt_staging_models]
-)
-def dbt_dimension_tables(context: AssetExecutionContext) -> MaterializeResult:
-    """Run dbt dimension tables"""
-    logger = get_dagster_logger()
-    
-    try:
-        dbt_dir = os.path.join(os.getcwd(), "telegram_analytics")
-        
-        logger.info("🔧 Running dbt dimension tables")
-        result = subprocess.run(
-            "dbt run --select marts.dim_*",
-            shell=True,
-            cwd=dbt_dir,
-            capture_output=True,
-            text=True,
-            timeout=600
-        )
-        
-        if result.returncode == 0:
-            logger.info("✅ dbt dimension tables completed successfully")
-            
-            # Get dimension table counts
-            from ..resources import DB_CONFIG
-            import psycopg2
-            
-            dim_counts = {}
-            with psycopg2.connect(**DB_CONFIG) as conn:
-                with conn.cursor() as cur:
-                    # Count records in dimension tables
-                    dim_tables = ['dim_channels', 'dim_dates', 'dim_objects']
-                    for table in dim_tables:
-                        try:
-                            cur.execute(f"SELECT COUNT(*) FROM analytics.{table}")
-                            dim_counts[table] = cur.fetchone()[0]
-                        except:
-                            dim_counts[table] = 0
-            
-            return MaterializeResult(
-                metadata={
-                    "dim_channels_count": MetadataValue.int(dim_counts.get('dim_channels', 0)),
-                    "dim_dates_count": MetadataValue.int(dim_counts.get('dim_dates', 0)),
-                    "dim_objects_count": MetadataValue.int(dim_counts.get('dim_objects', 0)),
-                    "status": MetadataValue.text("success"),
-                    "dbt_output": MetadataValue.text(result.stdout[-1000:])
-                }
-            )
-        else:
-            logger.error(f"❌ dbt dimension tables failed: {result.stderr}")
-            return MaterializeResult(
-                metadata={
-                    "status": MetadataValue.text("failed"),
-                    "error": MetadataValue.text(result.stderr),
-                    "dbt_output": MetadataValue.text(result.stdout)
-                }
+# In-process dbt runner: the manifest and adapter are parsed once and
+# reused across asset invocations instead of paying a full CLI cold
+# start (imports + profiles/project parse + manifest load) per asset.
+# The dbt-core import itself takes seconds, so it is deferred to the
+# first invocation - the Dagster webserver loading this module for
+# definitions never pays it. Falls back to the CLI when dbt-core isn't
+# importable in this env.
+_RUNNER = None
+_RUNNER_UNAVAILABLE = False
+NodeStatus = TestStatus = None
+
+def _get_runner():
+    """Import dbt and build the resident runner on first use"""
+    global _RUNNER, _RUNNER_UNAVAILABLE, NodeStatus, TestStatus
+    if _RUNNER is None and not _RUNNER_UNAVAILABLE:
+        try:
+            from dbt.cli.main import dbtRunner
+            _RUNNER = dbtRunner()
+        except ImportError:
+            _RUNNER_UNAVAILABLE = True
+            return None
+        # The status enums moved in dbt-core 1.8; either location is
+        # fine, and the callers fall back to string comparison if
+        # neither import works - missing enums must not disable the
+        # in-process runner
+        try:
+            from dbt.artifacts.schemas.results import (
+                NodeStatus as _NodeStatus,
+                TestStatus as _TestStatus,
             )
-            
-    except Exception as e:
-        logger.error(f"❌ Error running dbt dimension tables: {e}")
-        return MaterializeResult(
-            metadata={
-                "status": MetadataValue.text("error"),
-                "error": MetadataValue.text(str(e))
-            }
-        )
+            NodeStatus, TestStatus = _NodeStatus, _TestStatus
+        except ImportError:
+            try:
+                from dbt.contracts.results import (
+                    NodeStatus as _NodeStatus,
+                    TestStatus as _TestStatus,
+                )
+                NodeStatus, TestStatus = _NodeStatus, _TestStatus
+            except ImportError:
+                pass
+    return _RUNNER
+
+# Global flags skipping work the pipeline never reads: target JSON
+# artifacts, the relation cache pre-population and usage telemetry.
+# Partial parsing stays enabled so repeat invocations reuse the parsed
+# manifest.
+DBT_GLOBAL_FLAGS = [
+    "--no-write-json",
+    "--no-populate-cache",
+    "--no-send-anonymous-usage-stats",
+]
+
+def _invoke_dbt(args):
+    """Run a dbt command in-process, shelling out only as a fallback"""
+    runner = _get_runner()
+    if runner is not None:
+        return runner.invoke([
+            *DBT_GLOBAL_FLAGS,
+            *args,
+            "--project-dir", DBT_PROJECT_DIR,
+            "--profiles-dir", DBT_PROJECT_DIR
+        ])
+    # Bounded tail: retain only the last 20 log lines instead of
+    # buffering dbt's entire stdout in memory just to slice the end
+    tail = collections.deque(maxlen=20)
+    proc = subprocess.Popen(
+        ["dbt", *DBT_GLOBAL_FLAGS, *args],
+        cwd=DBT_PROJECT_DIR,
+        stdout=subprocess.PIPE,
+        stderr=subprocess.STDOUT,
+        text=True
+    )
+    for line in proc.stdout:
+        tail.append(line)
+    returncode = proc.wait(timeout=600)
+    tail_str = "".join(tail)[-1000:]
+    # Mirror the dbtRunnerResult shape so callers don't branch
+    return SimpleNamespace(
+        success=returncode == 0,
+        result=None,
+        exception=RuntimeError(tail_str) if returncode != 0 else None,
+        stdout_tail=tail_str
+    )
+
+def _node_results(res):
+    """Extract the per-node result list from a dbt invocation"""
+    return list(getattr(res.result, 'results', None) or [])
+
+def _count_success(results) -> int:
+    """Count nodes that built successfully, O(nodes) with no string scans"""
+    if NodeStatus is None:
+        # Enums unavailable; the status values are strings either way
+        return sum(1 for r in results if str(r.status) == "success")
+    return sum(1 for r in results if r.status == NodeStatus.Success)
+
+def _dbt_output(res) -> str:
+    """Compact per-node status summary for the dbt_output metadata field"""
+    results = _node_results(res)
+    if results:
+        return "\n".join(f"{r.node.name}: {r.status}" for r in results)[-1000:]
+    return getattr(res, 'stdout_tail', '') or "no node results"
 
 @asset(
-    description="dbt fact tables",
+    description="dbt build: staging, marts and tests in one invocation",
     compute_kind="dbt",
     group_name="dbt_transformations",
-    deps=[dbt_dimension_tables]
+    deps=["raw_telegram_messages"]
 )
-def dbt_fact_tables(context: AssetExecutionContext) -> MaterializeResult:
-    """Run dbt fact tables"""
+def dbt_build(context: AssetExecutionContext) -> MaterializeResult:
+    """Build all dbt models and run their tests in a single dbt process
+
+    One `dbt build` replaces the old staging -> dims -> facts -> tests
+    chain of four separate invocations: dbt already knows its internal
+    DAG and schedules independent nodes across --threads workers, and
+    the manifest/adapter initialize once instead of four times.
+    """
     logger = get_dagster_logger()
-    
+
     try:
-        dbt_dir = os.path.join(os.getcwd(), "telegram_analytics")
-        
-        logger.info("🔧 Running dbt fact tables")
-        result = subprocess.run(
-            "dbt run --select marts.fct_*",
-            shell=True,
-            cwd=dbt_dir,
-            capture_output=True,
-            text=True,
-            timeout=600
-        )
-        
-        if result.returncode == 0:
-            logger.info("✅ dbt fact tables completed successfully")
-            
-            # Get fact table counts
-            from ..resources import DB_CONFIG
-            import psycopg2
-            
-            fact_counts = {}
-            with psycopg2.connect(**DB_CONFIG) as conn:
-                with conn.cursor() as cur:
-                    # Count records in fact tables
-                    fact_tables = ['fct_messages', 'fct_image_detections']
-                    for table in fact_tables:
-                        try:
-                            cur.execute(f"SELECT COUNT(*) FROM analytics.{table}")
-                            fact_counts[table] = cur.fetchone()[0]
-                        except:
-                            fact_counts[table] = 0
-            
-            return MaterializeResult(
-                metadata={
-                    "fct_messages_count": MetadataValue.int(fact_counts.get('fct_messages', 0)),
-                    "fct_image_detections_count": MetadataValue.int(fact_counts.get('fct_image_detections', 0)),
-                    "status": MetadataValue.text("success"),
-                    "dbt_output": MetadataValue.text(result.stdout[-1000:])
-                }
-            )
-        else:
-            logger.error(f"❌ dbt fact tables failed: {result.stderr}")
+        logger.info("🔧 Running dbt build (models + tests)")
+        res = _invoke_dbt([
+            "build",
+            "--select", "staging", "marts.dim_*", "marts.fct_*", "marts.mv_*",
+            "--threads", "8"
+        ])
+
+        results = _node_results(res)
+
+        models_built = 0
+        tests_passed = 0
+        tests_failed = 0
+        for r in results:
+            is_test = str(getattr(r.node, 'resource_type', '')) == "test"
+            if is_test:
+                if TestStatus is not None:
+                    passed = r.status in (TestStatus.Pass, TestStatus.Warn)
+                else:
+                    passed = str(r.status) in ("pass", "warn")
+                if passed:
+                    tests_passed += 1
+                else:
+                    tests_failed += 1
+            elif (r.status == NodeStatus.Success if NodeStatus is not None
+                  else str(r.status) == "success"):
+                models_built += 1
+            # Per-node observability without splitting the dbt run
+            context.log_event(AssetObservation(
+                asset_key=f"dbt_{r.node.name}",
+                metadata={"status": str(r.status)}
+            ))
+
+        if not res.success:
+            logger.error(f"❌ dbt build failed: {res.exception}")
             return MaterializeResult(
                 metadata={
                     "status": MetadataValue.text("failed"),
-                    "error": MetadataValue.text(result.stderr),
-                    "dbt_output": MetadataValue.text(result.stdout)
+                    "error": MetadataValue.text(str(res.exception)),
+                    "dbt_output": MetadataValue.text(_dbt_output(res))
                 }
             )
-            
-    except Exception as e:
-        logger.error(f"❌ Error running dbt fact tables: {e}")
-        return MaterializeResult(
-            metadata={
-                "status": MetadataValue.text("error"),
-                "error": MetadataValue.text(str(e))
-            }
-        )
 
-@asset(
-    description="dbt test results",
-    compute_kind="dbt",
-    group_name="dbt_transformations",
-    deps=[dbt_fact_tables]
-)
-def dbt_tests(context: AssetExecutionContext) -> MaterializeResult:
-    """Run dbt tests"""
-    logger = get_dagster_logger()
-    
-    try:
-        dbt_dir = os.path.join(os.getcwd(), "telegram_analytics")
-        
-        logger.info("🧪 Running dbt tests")
-        result = subprocess.run(
-            "dbt test",
-            shell=True,
-            cwd=dbt_dir,
-            capture_output=True,
-            text=True,
-            timeout=600
-        )
-        
-        # dbt test returns non-zero if tests fail, but we want to capture results
-        logger.info("✅ dbt tests completed")
-        
-        # Parse test results
-        output_lines = result.stdout.split('\n')
-        passed_tests = 0
-        failed_tests = 0
-        
-        for line in output_lines:
-            if "PASS" in line:
-                passed_tests += 1
-            elif "FAIL" in line or "ERROR" in line:
-                failed_tests += 1
-        
-        total_tests = passed_tests + failed_tests
-        success_rate = (passed_tests / total_tests * 100) if total_tests > 0 else 0
-        
+        logger.info("✅ dbt build completed successfully")
+
+        # Row counts for the marts tables (estimates; see _table_counts)
+        table_counts = {}
+        with pg_conn() as conn:
+            with conn.cursor() as cur:
+                try:
+                    table_counts = _table_counts(cur, [
+                        'dim_channels', 'dim_dates', 'dim_objects',
+                        'fct_messages', 'fct_image_detections'
+                    ])
+                except:
+                    pass
+
+        total_tests = tests_passed + tests_failed
+        success_rate = (tests_passed / total_tests * 100) if total_tests > 0 else 0
+
         return MaterializeResult(
             metadata={
+                "models_built": MetadataValue.int(models_built),
                 "total_tests": MetadataValue.int(total_tests),
-                "passed_tests": MetadataValue.int(passed_tests),
-                "failed_tests": MetadataValue.int(failed_tests),
+                "passed_tests": MetadataValue.int(tests_passed),
+                "failed_tests": MetadataValue.int(tests_failed),
                 "success_rate": MetadataValue.float(success_rate),
-                "status": MetadataValue.text("completed"),
-                "dbt_output": MetadataValue.text(result.stdout[-1500:])  # Last 1500 chars
+                "dim_channels_count": MetadataValue.int(table_counts.get('dim_channels', 0)),
+                "dim_dates_count": MetadataValue.int(table_counts.get('dim_dates', 0)),
+                "dim_objects_count": MetadataValue.int(table_counts.get('dim_objects', 0)),
+                "fct_messages_count": MetadataValue.int(table_counts.get('fct_messages', 0)),
+                "fct_image_detections_count": MetadataValue.int(table_counts.get('fct_image_detections', 0)),
+                "count_method": MetadataValue.text("exact" if EXACT_COUNTS else "reltuples_estimate"),
+                "status": MetadataValue.text("success"),
+                "dbt_output": MetadataValue.text(_dbt_output(res))
             }
         )
-        
+
     except Exception as e:
-        logger.error(f"❌ Error running dbt tests: {e}")
+        logger.error(f"❌ Error running dbt build: {e}")
         return MaterializeResult(
             metadata={
                 "status": MetadataValue.text("error"),
@@ -2,58 +2,134 @@
 FastAPI Analytical Service Assets for Dagster Pipeline
 """
 import os
+import sys
 from dagster import asset, get_dagster_logger, MetadataValue, MaterializeResult
 from dagster import AssetExecutionContext
 import subprocess
+import functools
+import socket
 import requests
 import time
+import asyncio
+import aiohttp
+from requests.adapters import HTTPAdapter
 from typing import Dict, Any
 
+# Keep-alive session shared by all sync probes: sockets to localhost
+# are reused instead of re-handshaking per request
+_SESSION = requests.Session()
+_SESSION.mount("http://", HTTPAdapter(pool_connections=1, pool_maxsize=16, max_retries=0))
+
+# Paths resolved once at import time instead of per materialization
+_SCRIPTS_DIR = os.path.join(os.getcwd(), "scripts")
+_START_API_SCRIPT = os.path.join(_SCRIPTS_DIR, "start_api.py")
+
+BASE_URL = "http://localhost:8000"
+
+# Endpoint lists built once at import time
+ENDPOINTS = (
+    "/",
+    "/health",
+    "/api/v1/messages/stats",
+    "/api/v1/messages/timeline",
+    "/api/v1/channels/stats",
+    "/api/v1/users/stats",
+    "/api/v1/detection/stats",
+    "/api/v1/detection/objects",
+    "/api/v1/analytics/daily",
+    "/api/v1/analytics/hourly",
+    "/api/v1/analytics/top-channels",
+    "/api/v1/analytics/top-users"
+)
+
+PERFORMANCE_ENDPOINTS = (
+    "/api/v1/messages/stats",
+    "/api/v1/analytics/daily",
+    "/api/v1/detection/stats"
+)
+
+def _port_open(host="127.0.0.1", port=8000, timeout=0.2) -> bool:
+    """Raw TCP check: is anything listening on the API port?"""
+    with socket.socket(socket.AF_INET, socket.SOCK_STREAM) as s:
+        s.settimeout(timeout)
+        return s.connect_ex((host, port)) == 0
+
+@functools.lru_cache(maxsize=1)
+def _cached_health_probe(t_bucket: int) -> bool:
+    """Liveness probe memoized per minute bucket
+
+    Repeat materializations within the same schedule window reuse the
+    last probe result instead of re-hitting /health.
+    """
+    try:
+        return _SESSION.get(f"{BASE_URL}/health", timeout=1).status_code == 200
+    except Exception:
+        return False
+
+async def _probe(session, url):
+    """Time a single GET; returns (status_code, elapsed_seconds, error)"""
+    t0 = time.perf_counter()
+    try:
+        async with session.get(url) as response:
+            await response.read()
+            return response.status, time.perf_counter() - t0, None
+    except Exception as e:
+        return 0, 0.0, str(e)
+
+async def _probe_all(base_url, endpoints, repeats=1):
+    """Fire all endpoint probes concurrently over one connection pool"""
+    timeout = aiohttp.ClientTimeout(total=10)
+    connector = aiohttp.TCPConnector(limit=16, limit_per_host=16, keepalive_timeout=30)
+    async with aiohttp.ClientSession(timeout=timeout, connector=connector) as session:
+        return await asyncio.gather(*[
+            _probe(session, f"{base_url}{endpoint}")
+            for endpoint in endpoints
+            for _ in range(repeats)
+        ])
+
 @asset(
     description="Start FastAPI analytical service",
     compute_kind="api",
     group_name="api_service",
-    deps=["dbt_fact_tables", "yolo_data_quality"]
+    deps=["dbt_build", "yolo_data_quality"]
 )
 def fastapi_service(context: AssetExecutionContext) -> MaterializeResult:
     """Start FastAPI analytical service"""
     logger = get_dagster_logger()
     
     try:
-        # Check if API is already running
-        try:
-            response = requests.get("http://localhost:8000/docs", timeout=5)
-            if response.status_code == 200:
-                logger.info("🚀 FastAPI service is already running")
-                return MaterializeResult(
-                    metadata={
-                        "status": MetadataValue.text("already_running"),
-                        "api_url": MetadataValue.url("http://localhost:8000"),
-                        "docs_url": MetadataValue.url("http://localhost:8000/docs")
-                    }
-                )
-        except:
-            pass
+        # Fast pre-check: a 200ms raw connect rules out a dead port
+        # before spending an HTTP round-trip; /health then confirms the
+        # app (not just the kernel socket) is ready
+        if _port_open() and _cached_health_probe(int(time.time()) // 60):
+            logger.info("🚀 FastAPI service is already running")
+            return MaterializeResult(
+                metadata={
+                    "status": MetadataValue.text("already_running"),
+                    "api_url": MetadataValue.url("http://localhost:8000"),
+                    "docs_url": MetadataValue.url("http://localhost:8000/docs")
+                }
+            )
         
         # Start FastAPI service
-        script_path = os.path.join(os.getcwd(), "scripts", "start_api.py")
-        
         logger.info("🚀 Starting FastAPI analytical service")
         
-        # Start API in background
+        # Start API in background (argv form: no shell fork, venv python)
         process = subprocess.Popen(
-            f"python {script_path}",
-            shell=True,
+            [sys.executable, _START_API_SCRIPT],
             stdout=subprocess.PIPE,
             stderr=subprocess.PIPE,
             text=True
         )
         
-        # Wait for API to start
+        # Wait for API to start: exponential backoff gives sub-second
+        # detection instead of fixed 1s polling granularity
         max_retries = 30
+        delay = 0.05
+        waited = 0.0
         for i in range(max_retries):
             try:
-                response = requests.get("http://localhost:8000/docs", timeout=2)
+                response = _SESSION.get(f"{BASE_URL}/health", timeout=1)
                 if response.status_code == 200:
                     logger.info("✅ FastAPI service started successfully")
                     return MaterializeResult(
@@ -62,11 +138,14 @@ def fastapi_service(context: AssetExecutionContext) -> MaterializeResult:
                             "api_url": MetadataValue.url("http://localhost:8000"),
                             "docs_url": MetadataValue.url("http://localhost:8000/docs"),
                             "process_id": MetadataValue.int(process.pid),
-                            "startup_time": MetadataValue.int(i + 1)
+                            "startup_time": MetadataValue.float(waited)
                         }
                     )
             except:
-                time.sleep(1)
+                pass
+            time.sleep(delay)
+            waited += delay
+            delay = min(delay * 2, 1.0)
         
         logger.error("❌ FastAPI service failed to start")
         return MaterializeResult(
@@ -96,59 +175,37 @@ def api_endpoint_tests(context: AssetExecutionContext) -> MaterializeResult:
     logger = get_dagster_logger()
     
     try:
-        base_url = "http://localhost:8000"
-        
-        # Test endpoints
-        endpoints = [
-            "/",
-            "/health",
-            "/api/v1/messages/stats",
-            "/api/v1/messages/timeline",
-            "/api/v1/channels/stats",
-            "/api/v1/users/stats",
-            "/api/v1/detection/stats",
-            "/api/v1/detection/objects",
-            "/api/v1/analytics/daily",
-            "/api/v1/analytics/hourly",
-            "/api/v1/analytics/top-channels",
-            "/api/v1/analytics/top-users"
-        ]
+        base_url = BASE_URL
+        endpoints = ENDPOINTS
         
         test_results = {}
         successful_tests = 0
+        rt_sum = 0.0
         
-        for endpoint in endpoints:
-            try:
-                response = requests.get(f"{base_url}{endpoint}", timeout=10)
-                test_results[endpoint] = {
-                    "status_code": response.status_code,
-                    "response_time": response.elapsed.total_seconds(),
-                    "success": response.status_code == 200
-                }
-                
-                if response.status_code == 200:
-                    successful_tests += 1
-                    logger.info(f"✅ {endpoint} - OK ({response.elapsed.total_seconds():.2f}s)")
-                else:
-                    logger.warning(f"⚠️ {endpoint} - Status {response.status_code}")
-                    
-            except Exception as e:
-                test_results[endpoint] = {
-                    "status_code": 0,
-                    "response_time": 0,
-                    "success": False,
-                    "error": str(e)
-                }
-                logger.error(f"❌ {endpoint} - Error: {e}")
+        # All endpoints are independent; probe them concurrently so wall
+        # time is bounded by the slowest endpoint, not the sum
+        probes = asyncio.run(_probe_all(base_url, endpoints))
         
-        # Calculate success rate
-        success_rate = (successful_tests / len(endpoints)) * 100
+        for endpoint, (status_code, response_time, error) in zip(endpoints, probes):
+            test_results[endpoint] = {
+                "status_code": status_code,
+                "response_time": response_time,
+                "success": status_code == 200
+            }
+            
+            if status_code == 200:
+                successful_tests += 1
+                rt_sum += response_time
+                logger.info(f"✅ {endpoint} - OK ({response_time:.2f}s)")
+            elif error is not None:
+                test_results[endpoint]["error"] = error
+                logger.error(f"❌ {endpoint} - Error: {error}")
+            else:
+                logger.warning(f"⚠️ {endpoint} - Status {status_code}")
         
-        # Get average response time
-        avg_response_time = sum(
-            result["response_time"] for result in test_results.values() 
-            if result["success"]
-        ) / successful_tests if successful_tests > 0 else 0
+        # Success rate and average accumulated in the probe loop itself
+        success_rate = (successful_tests / len(endpoints)) * 100
+        avg_response_time = rt_sum / successful_tests if successful_tests > 0 else 0
         
         logger.info(f"📊 API Test Results: {successful_tests}/{len(endpoints)} endpoints passed ({success_rate:.1f}%)")
         
@@ -183,44 +240,47 @@ def api_performance_metrics(context: AssetExecutionContext) -> MaterializeResult
     logger = get_dagster_logger()
     
     try:
-        base_url = "http://localhost:8000"
-        
-        # Performance test endpoints
-        performance_endpoints = [
-            "/api/v1/messages/stats",
-            "/api/v1/analytics/daily",
-            "/api/v1/detection/stats"
-        ]
+        base_url = BASE_URL
+        performance_endpoints = PERFORMANCE_ENDPOINTS
         
         performance_results = {}
+        repeats = 5
+        avg_sum = 0.0
         
-        for endpoint in performance_endpoints:
-            try:
-                # Run multiple requests to get average
-                response_times = []
-                for i in range(5):
-                    response = requests.get(f"{base_url}{endpoint}", timeout=10)
-                    if response.status_code == 200:
-                        response_times.append(response.elapsed.total_seconds())
-                
-                if response_times:
-                    performance_results[endpoint] = {
-                        "avg_response_time": sum(response_times) / len(response_times),
-                        "min_response_time": min(response_times),
-                        "max_response_time": max(response_times),
-                        "requests_tested": len(response_times)
-                    }
-                    
-                    logger.info(f"📈 {endpoint} - Avg: {performance_results[endpoint]['avg_response_time']:.3f}s")
+        # 5 samples x 3 endpoints fired concurrently instead of 15
+        # sequential requests
+        probes = asyncio.run(_probe_all(base_url, performance_endpoints, repeats=repeats))
+        
+        for i, endpoint in enumerate(performance_endpoints):
+            # One pass over the samples: min/max/sum/count together
+            rt_min = float('inf')
+            rt_max = 0.0
+            rt_sum = 0.0
+            rt_count = 0
+            for status, elapsed, _ in probes[i * repeats:(i + 1) * repeats]:
+                if status == 200:
+                    rt_sum += elapsed
+                    rt_count += 1
+                    if elapsed < rt_min:
+                        rt_min = elapsed
+                    if elapsed > rt_max:
+                        rt_max = elapsed
+            
+            if rt_count:
+                endpoint_avg = rt_sum / rt_count
+                avg_sum += endpoint_avg
+                performance_results[endpoint] = {
+                    "avg_response_time": endpoint_avg,
+                    "min_response_time": rt_min,
+                    "max_response_time": rt_max,
+                    "requests_tested": rt_count
+                }
                 
-            except Exception as e:
-                logger.error(f"❌ Performance test failed for {endpoint}: {e}")
+                logger.info(f"📈 {endpoint} - Avg: {endpoint_avg:.3f}s")
         
-        # Calculate overall performance score
+        # Overall score from the per-endpoint averages already summed above
         if performance_results:
-            avg_response_time = sum(
-                result["avg_response_time"] for result in performance_results.values()
-            ) / len(performance_results)
+            avg_response_time = avg_sum / len(performance_results)
             
             # Performance score (lower response time = higher score)
             performance_score = max(0, min(100, int(100 - (avg_response_time * 50))))
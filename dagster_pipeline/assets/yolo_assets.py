@@ -2,98 +2,202 @@
 YOLO Object Detection Assets for Dagster Pipeline
 """
 import os
+import sys
+import asyncio
+import collections
+import functools
 from dagster import asset, get_dagster_logger, MetadataValue, MaterializeResult
-from dagster import AssetExecutionContext
-import subprocess
-import json
+from dagster import AssetExecutionContext, StaticPartitionsDefinition
 from typing import Dict, Any
 
+from ..resources import pg_conn
+from ..ml.yolo_runner import run_detection
+
+async def _run_subprocess(argv, cwd=None, timeout=3600, env=None):
+    """Run a child process, streaming its output instead of buffering it
+
+    The Dagster worker stays responsive (DB stats, health probes) while
+    the long-running child executes; argv form also skips the /bin/sh
+    fork that shell=True paid. Output is forwarded line-by-line into
+    the Dagster log as it arrives and only a bounded tail is retained,
+    so memory stays O(40 lines) for an hour-long verbose run instead of
+    holding the child's entire stdout, and logs show up live rather
+    than at completion. Returns (returncode, tail).
+    """
+    logger = get_dagster_logger()
+    proc = await asyncio.create_subprocess_exec(
+        *argv,
+        cwd=cwd,
+        env=env,
+        stdout=asyncio.subprocess.PIPE,
+        stderr=asyncio.subprocess.STDOUT
+    )
+
+    tail = collections.deque(maxlen=40)
+
+    async def _pump():
+        async for raw in proc.stdout:
+            line = raw.decode(errors="replace").rstrip()
+            logger.info(line)
+            tail.append(line)
+        return await proc.wait()
+
+    try:
+        returncode = await asyncio.wait_for(_pump(), timeout=timeout)
+    except asyncio.TimeoutError:
+        proc.kill()
+        raise
+    return returncode, "\n".join(tail)
+
+# One partition per scraped channel folder: partitioned runs let the
+# multiprocess executor process channels concurrently and re-runs touch
+# only the channel that changed
+CHANNEL_PARTITIONS = StaticPartitionsDefinition([
+    'CheMed123',
+    'lobelia4cosmetics',
+    'tikvahpharma',
+])
+
+@asset(
+    description="YOLO object detection for a single channel partition",
+    compute_kind="ml",
+    group_name="yolo_enrichment",
+    partitions_def=CHANNEL_PARTITIONS,
+    deps=["telegram_images"]
+)
+async def yolo_channel_detection(context: AssetExecutionContext) -> MaterializeResult:
+    """Run YOLO detection over one channel's image folder"""
+    logger = get_dagster_logger()
+    channel = context.partition_key
+    
+    try:
+        logger.info(f"🤖 Starting YOLO detection for channel {channel}")
+        loop = asyncio.get_running_loop()
+        await asyncio.wait_for(
+            loop.run_in_executor(None, run_detection, channel),
+            timeout=3600
+        )
+        
+        logger.info(f"✅ YOLO detection completed for {channel}")
+        return MaterializeResult(
+            metadata={
+                "channel": MetadataValue.text(channel),
+                "status": MetadataValue.text("success")
+            }
+        )
+    except Exception as e:
+        logger.error(f"❌ Error running YOLO detection for {channel}: {e}")
+        return MaterializeResult(
+            metadata={
+                "channel": MetadataValue.text(channel),
+                "status": MetadataValue.text("error"),
+                "error": MetadataValue.text(str(e))
+            }
+        )
+
+def _fetch_detection_stats():
+    """Collect detection statistics for asset metadata"""
+    detection_stats = {}
+    with pg_conn() as conn:
+        with conn.cursor() as cur:
+            # Totals, distinct counts, avg confidence and top-5 objects
+            # in one statement: a single round-trip and one heap scan.
+            # The top-5 ranking reads the mv_top_detected_objects
+            # materialized view (refreshed each dbt cycle) instead of
+            # re-grouping the whole detections table per run.
+            cur.execute("""
+                WITH agg AS (
+                    SELECT
+                        COUNT(*) as total_detections,
+                        COUNT(DISTINCT detected_object_class) as unique_objects,
+                        COALESCE(AVG(confidence_score), 0) as avg_confidence,
+                        COUNT(DISTINCT message_id) as messages_with_detections
+                    FROM raw.image_detections
+                ),
+                top AS (
+                    SELECT detected_object_class, cnt as count
+                    FROM analytics.mv_top_detected_objects
+                    ORDER BY cnt DESC
+                    LIMIT 5
+                )
+                SELECT
+                    agg.total_detections,
+                    agg.unique_objects,
+                    agg.avg_confidence,
+                    agg.messages_with_detections,
+                    (SELECT array_agg(detected_object_class || ': ' || count)
+                     FROM top) as top_objects
+                FROM agg
+            """)
+            (detection_stats['total_detections'],
+             detection_stats['unique_objects'],
+             detection_stats['avg_confidence'],
+             detection_stats['messages_with_detections'],
+             top_objects) = cur.fetchone()
+            detection_stats['top_objects'] = list(top_objects or [])
+    return detection_stats
+
+def _fetch_yolo_model_counts():
+    """Collect YOLO model table counts for asset metadata
+
+    The counts are observability metadata, so they come from
+    pg_class.reltuples - an O(1) catalog lookup kept fresh by the marts
+    ANALYZE post-hook - instead of three full heap scans right after a
+    dbt run already touched these tables.
+    """
+    model_counts = {}
+    with pg_conn() as conn:
+        with conn.cursor() as cur:
+            try:
+                cur.execute("""
+                    SELECT relname, reltuples::bigint
+                    FROM pg_class
+                    WHERE oid IN ('analytics.stg_image_detections'::regclass,
+                                  'analytics.fct_image_detections'::regclass,
+                                  'analytics.dim_objects'::regclass)
+                """)
+                model_counts = dict(cur.fetchall())
+            except:
+                pass
+    return model_counts
+
 @asset(
     description="YOLO object detection on telegram images",
     compute_kind="ml",
     group_name="yolo_enrichment",
-    deps=["telegram_images", "dbt_staging_models"]
+    deps=["telegram_images", "dbt_build"]
 )
-def yolo_object_detection(context: AssetExecutionContext) -> MaterializeResult:
+async def yolo_object_detection(context: AssetExecutionContext) -> MaterializeResult:
     """Run YOLO object detection on telegram images"""
     logger = get_dagster_logger()
     
     try:
-        # Run YOLO detection script
-        script_path = os.path.join(os.getcwd(), "scripts", "yolo_object_detection.py")
-        
+        # Run detection in-process: the model and CUDA context stay
+        # resident in the worker instead of a fresh interpreter +
+        # weights load per run. The executor thread keeps the event
+        # loop free for other work.
         logger.info("🤖 Starting YOLO object detection")
-        result = subprocess.run(
-            f"python {script_path}",
-            shell=True,
-            capture_output=True,
-            text=True,
+        loop = asyncio.get_running_loop()
+        await asyncio.wait_for(
+            loop.run_in_executor(None, run_detection),
             timeout=3600  # 1 hour timeout
         )
         
-        if result.returncode == 0:
-            logger.info("✅ YOLO object detection completed successfully")
-            
-            # Get detection statistics
-            DB_CONFIG = {
-                "host": "127.0.0.1",
-                "port": 5432,
-                "database": "kara_medical",
-                "user": "postgres",
-                "password": "your_secure_password"
+        logger.info("✅ YOLO object detection completed successfully")
+        
+        # Get detection statistics off-loop so DB I/O doesn't block
+        detection_stats = await loop.run_in_executor(None, _fetch_detection_stats)
+        
+        return MaterializeResult(
+            metadata={
+                "total_detections": MetadataValue.int(detection_stats['total_detections']),
+                "unique_objects": MetadataValue.int(detection_stats['unique_objects']),
+                "avg_confidence": MetadataValue.float(detection_stats['avg_confidence']),
+                "messages_with_detections": MetadataValue.int(detection_stats['messages_with_detections']),
+                "top_objects": MetadataValue.text("; ".join(detection_stats['top_objects'])),
+                "status": MetadataValue.text("success")
             }
-            import psycopg2
-            
-            detection_stats = {}
-            with psycopg2.connect(**DB_CONFIG) as conn:
-                with conn.cursor() as cur:
-                    # Total detections
-                    cur.execute("SELECT COUNT(*) FROM raw.image_detections")
-                    detection_stats['total_detections'] = cur.fetchone()[0]
-                    
-                    # Unique objects
-                    cur.execute("SELECT COUNT(DISTINCT detected_object_class) FROM raw.image_detections")
-                    detection_stats['unique_objects'] = cur.fetchone()[0]
-                    
-                    # Average confidence
-                    cur.execute("SELECT AVG(confidence_score) FROM raw.image_detections")
-                    detection_stats['avg_confidence'] = cur.fetchone()[0] or 0
-                    
-                    # Messages with detections
-                    cur.execute("SELECT COUNT(DISTINCT message_id) FROM raw.image_detections WHERE message_id IS NOT NULL")
-                    detection_stats['messages_with_detections'] = cur.fetchone()[0]
-                    
-                    # Top detected objects
-                    cur.execute("""
-                        SELECT detected_object_class, COUNT(*) as count
-                        FROM raw.image_detections
-                        GROUP BY detected_object_class
-                        ORDER BY count DESC
-                        LIMIT 5
-                    """)
-                    top_objects = cur.fetchall()
-                    detection_stats['top_objects'] = [f"{obj[0]}: {obj[1]}" for obj in top_objects]
-            
-            return MaterializeResult(
-                metadata={
-                    "total_detections": MetadataValue.int(detection_stats['total_detections']),
-                    "unique_objects": MetadataValue.int(detection_stats['unique_objects']),
-                    "avg_confidence": MetadataValue.float(detection_stats['avg_confidence']),
-                    "messages_with_detections": MetadataValue.int(detection_stats['messages_with_detections']),
-                    "top_objects": MetadataValue.text("; ".join(detection_stats['top_objects'])),
-                    "status": MetadataValue.text("success"),
-                    "script_output": MetadataValue.text(result.stdout[-1000:])
-                }
-            )
-        else:
-            logger.error(f"❌ YOLO object detection failed: {result.stderr}")
-            return MaterializeResult(
-                metadata={
-                    "status": MetadataValue.text("failed"),
-                    "error": MetadataValue.text(result.stderr),
-                    "script_output": MetadataValue.text(result.stdout)
-                }
-            )
+        )
             
     except Exception as e:
         logger.error(f"❌ Error running YOLO object detection: {e}")
@@ -108,9 +212,9 @@ def yolo_object_detection(context: AssetExecutionContext) -> MaterializeResult:
     description="dbt models for YOLO detection data",
     compute_kind="dbt",
     group_name="yolo_enrichment",
-    deps=["yolo_object_detection", "dbt_dimension_tables"]
+    deps=["yolo_object_detection", "dbt_build"]
 )
-def yolo_dbt_models(context: AssetExecutionContext) -> MaterializeResult:
+async def yolo_dbt_models(context: AssetExecutionContext) -> MaterializeResult:
     """Run dbt models for YOLO detection data"""
     logger = get_dagster_logger()
     
@@ -118,66 +222,43 @@ def yolo_dbt_models(context: AssetExecutionContext) -> MaterializeResult:
         dbt_dir = os.path.join(os.getcwd(), "telegram_analytics")
         
         logger.info("🔧 Running dbt models for YOLO data")
-        result = subprocess.run(
-            "dbt run --select stg_image_detections+ fct_image_detections+ dim_objects+",
-            shell=True,
+        # --threads 8 lets dbt build independent YOLO models in
+        # parallel; DBT_PARTIAL_PARSE reuses the parsed manifest from
+        # the previous invocation instead of re-parsing the project
+        env = dict(os.environ, DBT_PARTIAL_PARSE="true")
+        returncode, output_tail = await _run_subprocess(
+            ["dbt", "run", "--select",
+             "stg_image_detections+", "fct_image_detections+", "dim_objects+",
+             "--threads", "8"],
             cwd=dbt_dir,
-            capture_output=True,
-            text=True,
-            timeout=600
+            timeout=600,
+            env=env
         )
         
-        if result.returncode == 0:
+        if returncode == 0:
             logger.info("✅ dbt YOLO models completed successfully")
             
-            # Get model counts
-            DB_CONFIG = {
-                "host": "127.0.0.1",
-                "port": 5432,
-                "database": "kara_medical",
-                "user": "postgres",
-                "password": "your_secure_password"
-            }
-            import psycopg2
-            
-            model_counts = {}
-            with psycopg2.connect(**DB_CONFIG) as conn:
-                with conn.cursor() as cur:
-                    # Count records in YOLO-related tables
-                    try:
-                        cur.execute("SELECT COUNT(*) FROM analytics.stg_image_detections")
-                        model_counts['stg_image_detections'] = cur.fetchone()[0]
-                    except:
-                        model_counts['stg_image_detections'] = 0
-                    
-                    try:
-                        cur.execute("SELECT COUNT(*) FROM analytics.fct_image_detections")
-                        model_counts['fct_image_detections'] = cur.fetchone()[0]
-                    except:
-                        model_counts['fct_image_detections'] = 0
-                    
-                    try:
-                        cur.execute("SELECT COUNT(*) FROM analytics.dim_objects")
-                        model_counts['dim_objects'] = cur.fetchone()[0]
-                    except:
-                        model_counts['dim_objects'] = 0
+            # Get model counts off-loop so DB I/O doesn't block
+            loop = asyncio.get_running_loop()
+            model_counts = await loop.run_in_executor(None, _fetch_yolo_model_counts)
             
             return MaterializeResult(
                 metadata={
                     "stg_image_detections_count": MetadataValue.int(model_counts['stg_image_detections']),
                     "fct_image_detections_count": MetadataValue.int(model_counts['fct_image_detections']),
                     "dim_objects_count": MetadataValue.int(model_counts['dim_objects']),
+                    "count_method": MetadataValue.text("reltuples_estimate"),
                     "status": MetadataValue.text("success"),
-                    "dbt_output": MetadataValue.text(result.stdout[-1000:])
+                    "dbt_output": MetadataValue.text(output_tail[-1000:])
                 }
             )
         else:
-            logger.error(f"❌ dbt YOLO models failed: {result.stderr}")
+            logger.error(f"❌ dbt YOLO models failed: {output_tail}")
             return MaterializeResult(
                 metadata={
                     "status": MetadataValue.text("failed"),
-                    "error": MetadataValue.text(result.stderr),
-                    "dbt_output": MetadataValue.text(result.stdout)
+                    "error": MetadataValue.text(output_tail[-1000:]),
+                    "dbt_output": MetadataValue.text(output_tail)
                 }
             )
             
@@ -190,6 +271,73 @@ def yolo_dbt_models(context: AssetExecutionContext) -> MaterializeResult:
             }
         )
 
+def _quality_table_version():
+    """Cheap fingerprint of the fact table's physical state
+
+    Page count, planner row estimate and on-disk size all move whenever
+    dbt rebuilds the table (and ANALYZE runs via the marts post-hook),
+    so the tuple works as a cache key: same version means the heavy
+    quality scans would return the same answer.
+    """
+    with pg_conn() as conn:
+        with conn.cursor() as cur:
+            cur.execute("""
+                SELECT relpages, reltuples::bigint,
+                       pg_total_relation_size(oid)
+                FROM pg_class
+                WHERE oid = 'analytics.fct_image_detections'::regclass
+            """)
+            return cur.fetchone()
+
+@functools.lru_cache(maxsize=4)
+def _fetch_quality_row(version):
+    """Run the quality aggregates, memoized per table version
+
+    Debug re-runs against unchanged data skip the scans entirely; a dbt
+    rebuild changes the version tuple and naturally invalidates the
+    entry. Returns the raw result row (a tuple, safe to cache).
+    """
+    with pg_conn() as conn:
+        with conn.cursor() as cur:
+            # Confidence buckets and avg score over one plain scan
+            # of the fact table (no join needed for those), orphans
+            # as a NOT EXISTS anti-join the planner can satisfy with
+            # a hash anti-join against fct_messages.message_id, and
+            # the category distribution folded into the same
+            # statement - one round-trip total
+            cur.execute("""
+                WITH agg AS (
+                    SELECT
+                        COUNT(*) FILTER (WHERE confidence_score >= 0.8) as high_conf,
+                        COUNT(*) FILTER (WHERE confidence_score >= 0.5
+                                         AND confidence_score < 0.8) as med_conf,
+                        COUNT(*) FILTER (WHERE confidence_score < 0.5) as low_conf,
+                        COALESCE(AVG(detection_score), 0) as avg_score
+                    FROM analytics.fct_image_detections
+                ),
+                orphans AS (
+                    SELECT COUNT(*) as orphaned
+                    FROM analytics.fct_image_detections fid
+                    WHERE NOT EXISTS (
+                        SELECT 1 FROM analytics.fct_messages fm
+                        WHERE fm.message_id = fid.message_id
+                    )
+                ),
+                cats AS (
+                    SELECT object_category, COUNT(*) as count
+                    FROM analytics.dim_objects
+                    GROUP BY object_category
+                    ORDER BY count DESC
+                )
+                SELECT
+                    agg.high_conf, agg.med_conf, agg.low_conf,
+                    orphans.orphaned, agg.avg_score,
+                    (SELECT array_agg(object_category || ': ' || count)
+                     FROM cats) as category_distribution
+                FROM agg, orphans
+            """)
+            return cur.fetchone()
+
 @asset(
     description="YOLO data quality and validation checks",
     compute_kind="python",
@@ -201,55 +349,18 @@ def yolo_data_quality(context: AssetExecutionContext) -> MaterializeResult:
     logger = get_dagster_logger()
     
     try:
-        DB_CONFIG = {
-            "host": "127.0.0.1",
-            "port": 5432,
-            "database": "kara_medical",
-            "user": "postgres",
-            "password": "your_secure_password"
-        }
-        import psycopg2
-        
         quality_checks = {}
         
-        with psycopg2.connect(**DB_CONFIG) as conn:
-            with conn.cursor() as cur:
-                # Check confidence score distribution
-                cur.execute("""
-                    SELECT 
-                        COUNT(CASE WHEN confidence_score >= 0.8 THEN 1 END) as high_conf,
-                        COUNT(CASE WHEN confidence_score >= 0.5 AND confidence_score < 0.8 THEN 1 END) as med_conf,
-                        COUNT(CASE WHEN confidence_score < 0.5 THEN 1 END) as low_conf
-                    FROM analytics.fct_image_detections
-                """)
-                conf_dist = cur.fetchone()
-                quality_checks['confidence_distribution'] = {
-                    'high': conf_dist[0],
-                    'medium': conf_dist[1],
-                    'low': conf_dist[2]
-                }
-                
-                # Check for orphaned detections
-                cur.execute("""
-                    SELECT COUNT(*) FROM analytics.fct_image_detections fid
-                    LEFT JOIN analytics.fct_messages fm ON fid.message_id = fm.message_id
-                    WHERE fm.message_id IS NULL
-                """)
-                quality_checks['orphaned_detections'] = cur.fetchone()[0]
-                
-                # Check object category distribution
-                cur.execute("""
-                    SELECT object_category, COUNT(*) as count
-                    FROM analytics.dim_objects
-                    GROUP BY object_category
-                    ORDER BY count DESC
-                """)
-                category_dist = cur.fetchall()
-                quality_checks['category_distribution'] = [f"{cat[0]}: {cat[1]}" for cat in category_dist]
-                
-                # Check average detection score
-                cur.execute("SELECT AVG(detection_score) FROM analytics.fct_image_detections")
-                quality_checks['avg_detection_score'] = cur.fetchone()[0] or 0
+        (high_conf, med_conf, low_conf, orphaned, avg_score,
+         category_dist) = _fetch_quality_row(_quality_table_version())
+        quality_checks['confidence_distribution'] = {
+            'high': high_conf,
+            'medium': med_conf,
+            'low': low_conf
+        }
+        quality_checks['orphaned_detections'] = orphaned
+        quality_checks['category_distribution'] = list(category_dist or [])
+        quality_checks['avg_detection_score'] = avg_score
         
         # Calculate quality score
         total_detections = sum(quality_checks['confidence_distribution'].values())
@@ -0,0 +1,3 @@
+"""
+ML helpers for the Dagster pipeline
+"""
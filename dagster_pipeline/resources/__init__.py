@@ -2,9 +2,13 @@
 Dagster Resources for Telegram Analytics Pipeline
 """
 import os
+import shlex
 import subprocess
+import sys
 from dagster import resource, get_dagster_logger
 import psycopg2
+from psycopg2.extras import execute_values
+from psycopg2.pool import ThreadedConnectionPool
 from contextlib import contextmanager
 from typing import Dict, Any
 
@@ -17,6 +21,115 @@ DB_CONFIG = {
     'password': os.getenv('DB_PASSWORD', 'your_secure_password')
 }
 
+# Default paths resolved once at import time
+DBT_PROJECT_DIR = os.path.join(os.getcwd(), "telegram_analytics")
+SCRIPTS_DIR = os.path.join(os.getcwd(), "scripts")
+
+# Shared connection pool: assets borrow connections instead of paying a
+# fresh TCP handshake + auth round-trip per metadata query
+_PG_POOL = None
+
+# Optional psycopg3 pool for pipeline mode: several independent
+# statements ship to the server in one network round-trip instead of
+# one each. psycopg2 stays the workhorse everywhere else, so psycopg3
+# is probed lazily and pg_pipeline degrades to sequential execution on
+# the psycopg2 pool when it isn't installed.
+_PG3_POOL = None
+
+def _get_pg3_pool():
+    """Get (or lazily create) the psycopg3 pool, None if unavailable"""
+    global _PG3_POOL
+    if _PG3_POOL is None:
+        try:
+            from psycopg_pool import ConnectionPool
+        except ImportError:
+            return None
+        conninfo = " ".join(f"{k}={v}" for k, v in DB_CONFIG.items())
+        _PG3_POOL = ConnectionPool(conninfo, min_size=1, max_size=8)
+    return _PG3_POOL
+
+def pg_pipeline(queries):
+    """Run independent read queries batched into one round-trip
+
+    `queries` is a list of (sql, params) pairs; returns the first row
+    of each. Under psycopg3 the statements go out in pipeline mode, so
+    N queries cost one network round-trip; without psycopg3 they run
+    sequentially on the shared psycopg2 pool.
+    """
+    pool = _get_pg3_pool()
+    if pool is not None:
+        with pool.connection() as conn:
+            with conn.pipeline():
+                cursors = [conn.execute(sql, params or ())
+                           for sql, params in queries]
+            return [cur.fetchone() for cur in cursors]
+    with pg_conn() as conn:
+        with conn.cursor() as cur:
+            rows = []
+            for sql, params in queries:
+                cur.execute(sql, params or ())
+                rows.append(cur.fetchone())
+            return rows
+
+def _get_pool():
+    """Get (or lazily create) the shared connection pool"""
+    global _PG_POOL
+    if _PG_POOL is None or _PG_POOL.closed:
+        _PG_POOL = ThreadedConnectionPool(minconn=1, maxconn=8, **DB_CONFIG)
+    return _PG_POOL
+
+def bulk_insert_detections(conn, rows, page_size=1000):
+    """Insert YOLO detection rows in batches instead of row-by-row
+
+    execute_values folds up to `page_size` rows into one INSERT
+    statement, switching psycopg2 into its fast-execution path; on bulk
+    loads this is orders of magnitude faster than per-row execute().
+    """
+    with conn.cursor() as cur:
+        execute_values(
+            cur,
+            """
+            INSERT INTO raw.image_detections
+                (image_path, image_hash, message_id, channel_name,
+                 detected_object_class, confidence_score,
+                 bbox_x1, bbox_y1, bbox_x2, bbox_y2)
+            VALUES %s
+            """,
+            rows,
+            page_size=page_size
+        )
+    conn.commit()
+
+def pg_stream(query, params=None, itersize=10000):
+    """Stream a large result set through a named server-side cursor
+
+    Postgres serves rows through a portal in batches of `itersize`, so
+    client memory stays bounded no matter how large the raw table scan
+    is; fetchall() would materialize everything at once.
+    """
+    with pg_conn() as conn:
+        cursor = conn.cursor(name='telegram_scan', itersize=itersize)
+        try:
+            cursor.execute(query, params or ())
+            for row in cursor:
+                yield row
+        finally:
+            cursor.close()
+
+@contextmanager
+def pg_conn():
+    """Borrow a pooled connection and return it when done"""
+    pool = _get_pool()
+    conn = pool.getconn()
+    try:
+        yield conn
+        conn.commit()
+    except Exception:
+        conn.rollback()
+        raise
+    finally:
+        pool.putconn(conn)
+
 @resource
 def postgres_resource(context):
     """PostgreSQL database resource"""
@@ -24,19 +137,16 @@ def postgres_resource(context):
     
     @contextmanager
     def get_connection():
-        """Get database connection context manager"""
-        conn = None
+        """Get database connection context manager (pooled)"""
         try:
-            conn = psycopg2.connect(**DB_CONFIG)
-            logger.info("✅ PostgreSQL connection established")
-            yield conn
+            with pg_conn() as conn:
+                logger.info("✅ PostgreSQL connection acquired from pool")
+                yield conn
         except Exception as e:
             logger.error(f"❌ PostgreSQL connection failed: {e}")
             raise
         finally:
-            if conn:
-                conn.close()
-                logger.info("🔒 PostgreSQL connection closed")
+            logger.info("🔒 PostgreSQL connection returned to pool")
     
     return get_connection
 
@@ -49,13 +159,21 @@ def dbt_resource(context):
         """Run dbt command and return result"""
         try:
             if cwd is None:
-                cwd = os.path.join(os.getcwd(), "telegram_analytics")
+                cwd = DBT_PROJECT_DIR
             
+            # argv form skips the /bin/sh fork-exec that shell=True pays
+            # and keeps arguments safe from shell interpretation. Every
+            # command gets --threads 8 (dbt parallelizes independent
+            # nodes) unless the caller already chose a thread count,
+            # and partial parsing reuses the cached manifest.
             logger.info(f"🔧 Running dbt command: {command}")
+            argv = ["dbt", *shlex.split(command)]
+            if "--threads" not in argv:
+                argv += ["--threads", "8"]
             result = subprocess.run(
-                f"dbt {command}",
-                shell=True,
+                argv,
                 cwd=cwd,
+                env=dict(os.environ, DBT_PARTIAL_PARSE="true"),
                 capture_output=True,
                 text=True,
                 timeout=600  # 10 minutes timeout
@@ -104,12 +222,11 @@ def yolo_resource(context):
         """Run YOLO object detection script"""
         try:
             if script_path is None:
-                script_path = os.path.join(os.getcwd(), "scripts", "yolo_object_detection.py")
+                script_path = os.path.join(SCRIPTS_DIR, "yolo_object_detection.py")
             
             logger.info("🤖 Starting YOLO object detection")
             result = subprocess.run(
-                f"python {script_path}",
-                shell=True,
+                [sys.executable, script_path],
                 capture_output=True,
                 text=True,
                 timeout=3600  # 1 hour timeout
@@ -154,12 +271,11 @@ def telegram_scraper_resource(context):
         """Run telegram scraper script"""
         try:
             if script_path is None:
-                script_path = os.path.join(os.getcwd(), "scripts", "telegram_scraper.py")
+                script_path = os.path.join(SCRIPTS_DIR, "telegram_scraper.py")
             
             logger.info("📱 Starting Telegram data scraping")
             result = subprocess.run(
-                f"python {script_path}",
-                shell=True,
+                [sys.executable, script_path],
                 capture_output=True,
                 text=True,
                 timeout=1800  # 30 minutes timeout
@@ -1,65 +1,74 @@
-import psycopg2
+import sys
+from pathlib import Path
 
-conn = psycopg2.connect(
-    host='127.0.0.1',
-    port=5432,
-    dbname='kara_medical',
-    user='postgres',
-    password='your_secure_password'
-)
+sys.path.insert(0, str(Path(__file__).resolve().parent))
 
-cur = conn.cursor()
+from db import get_conn
 
-# Get column names
-cur.execute("""
-    SELECT column_name, data_type 
-    FROM information_schema.columns 
-    WHERE table_name = 'image_detections' 
-    AND table_schema = 'raw' 
-    ORDER BY ordinal_position
-""")
-columns = cur.fetchall()
+with get_conn() as conn:
+    cur = conn.cursor()
 
-print("Table structure:")
-for col_name, col_type in columns:
-    print(f"  {col_name}: {col_type}")
+    # Get column names
+    cur.execute("""
+        SELECT column_name, data_type 
+        FROM information_schema.columns 
+        WHERE table_name = 'image_detections' 
+        AND table_schema = 'raw' 
+        ORDER BY ordinal_position
+    """)
+    columns = cur.fetchall()
 
-# Get sample data
-cur.execute("SELECT * FROM raw.image_detections LIMIT 5")
-rows = cur.fetchall()
+    print("Table structure:")
+    for col_name, col_type in columns:
+        print(f"  {col_name}: {col_type}")
 
-print("\nSample data:")
-for row in rows:
-    print(row)
+    # Get sample data through a server-side cursor: rows stream to the
+    # client in small batches instead of the whole result materializing
+    # in memory at once
+    sample_cur = conn.cursor(name='detection_sample')
+    sample_cur.itersize = 1000
+    sample_cur.execute("SELECT * FROM raw.image_detections LIMIT 5")
 
-# Get summary statistics
-cur.execute("""
-    SELECT 
-        COUNT(*) as total_detections,
-        COUNT(DISTINCT message_id) as messages_with_detections,
-        COUNT(DISTINCT detected_object_class) as unique_objects,
-        AVG(confidence_score) as avg_confidence
-    FROM raw.image_detections
-""")
-stats = cur.fetchone()
-print(f"\nSummary Statistics:")
-print(f"Total detections: {stats[0]}")
-print(f"Messages with detections: {stats[1]}")
-print(f"Unique object classes: {stats[2]}")
-print(f"Average confidence: {stats[3]:.3f}")
+    print("\nSample data:")
+    for row in sample_cur:
+        print(row)
+    sample_cur.close()
 
-# Get top detected objects
-cur.execute("""
-    SELECT detected_object_class, COUNT(*) as count
-    FROM raw.image_detections
-    GROUP BY detected_object_class
-    ORDER BY count DESC
-    LIMIT 10
-""")
-top_objects = cur.fetchall()
+    # Summary statistics and top-10 objects from one statement: a single
+    # round-trip, and the planner feeds both aggregates from the same scan
+    cur.execute("""
+        WITH agg AS (
+            SELECT 
+                COUNT(*) as total_detections,
+                COUNT(DISTINCT message_id) as messages_with_detections,
+                COUNT(DISTINCT detected_object_class) as unique_objects,
+                AVG(confidence_score) as avg_confidence
+            FROM raw.image_detections
+        ),
+        top AS (
+            SELECT detected_object_class, COUNT(*) as count
+            FROM raw.image_detections
+            GROUP BY detected_object_class
+            ORDER BY count DESC
+            LIMIT 10
+        )
+        SELECT
+            agg.total_detections,
+            agg.messages_with_detections,
+            agg.unique_objects,
+            agg.avg_confidence,
+            (SELECT array_agg(detected_object_class || ':' || count)
+             FROM top) as top_objects
+        FROM agg
+    """)
+    (total, with_msgs, unique_objects, avg_conf, top_objects) = cur.fetchone()
+    print(f"\nSummary Statistics:")
+    print(f"Total detections: {total}")
+    print(f"Messages with detections: {with_msgs}")
+    print(f"Unique object classes: {unique_objects}")
+    print(f"Average confidence: {avg_conf:.3f}")
 
-print("\nTop detected objects:")
-for obj, count in top_objects:
-    print(f"  {obj}: {count}")
-
-conn.close()
+    print("\nTop detected objects:")
+    for entry in top_objects or []:
+        obj, _, count = entry.rpartition(':')
+        print(f"  {obj}: {count}")
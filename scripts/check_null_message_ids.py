@@ -1,52 +1,53 @@
-import psycopg2
-
-conn = psycopg2.connect(
-    host='127.0.0.1',
-    port=5432,
-    dbname='kara_medical',
-    user='postgres',
-    password='your_secure_password'
-)
-
-cur = conn.cursor()
-
-# Check null message_id records
-cur.execute("""
-    SELECT image_path, channel_name, message_id 
-    FROM raw.image_detections 
-    WHERE message_id IS NULL 
-    LIMIT 10
-""")
-rows = cur.fetchall()
-
-print("Sample null message_id records:")
-for row in rows:
-    print(f"  Path: {row[0]}, Channel: {row[1]}, Message ID: {row[2]}")
-
-# Check if there's a pattern in the image paths
-cur.execute("""
-    SELECT DISTINCT channel_name, COUNT(*) as null_count
-    FROM raw.image_detections 
-    WHERE message_id IS NULL 
-    GROUP BY channel_name
-""")
-channel_stats = cur.fetchall()
-
-print("\nNull message_id by channel:")
-for channel, count in channel_stats:
-    print(f"  {channel}: {count}")
-
-# Check if we can identify a pattern in the image paths
-cur.execute("""
-    SELECT image_path
-    FROM raw.image_detections 
-    WHERE message_id IS NULL 
-    LIMIT 5
-""")
-paths = cur.fetchall()
-
-print("\nSample image paths with null message_id:")
-for path in paths:
-    print(f"  {path[0]}")
-
-conn.close()
+import sys
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent))
+
+from db import get_conn
+
+with get_conn() as conn:
+    cur = conn.cursor()
+
+    # One round-trip total: the index DDL and the report query go out
+    # in the same execute (psycopg2 returns the last statement's rows).
+    # The partial index covers only the NULL rows, so both checks become
+    # lookups over a tiny index instead of sequential scans of the whole
+    # detections table (also registered in scripts/db_migrations.py),
+    # and the sample plus per-channel counts share one scan of the slice.
+    cur.execute("""
+        CREATE INDEX IF NOT EXISTS ix_img_det_null_msg
+        ON raw.image_detections (channel_name)
+        WHERE message_id IS NULL;
+
+        WITH nulls AS (
+            SELECT image_path, channel_name
+            FROM raw.image_detections
+            WHERE message_id IS NULL
+        ),
+        sample AS (
+            SELECT image_path, channel_name FROM nulls LIMIT 10
+        ),
+        by_channel AS (
+            SELECT channel_name, COUNT(*) as null_count
+            FROM nulls
+            GROUP BY channel_name
+        )
+        SELECT
+            (SELECT array_agg(image_path || '|' || channel_name) FROM sample),
+            (SELECT array_agg(channel_name || '|' || null_count) FROM by_channel)
+    """)
+    sample_rows, channel_stats = cur.fetchone()
+
+    print("Sample null message_id records:")
+    for entry in sample_rows or []:
+        path, _, channel = entry.rpartition('|')
+        print(f"  Path: {path}, Channel: {channel}, Message ID: None")
+
+    print("\nNull message_id by channel:")
+    for entry in channel_stats or []:
+        channel, _, count = entry.rpartition('|')
+        print(f"  {channel}: {count}")
+
+    print("\nSample image paths with null message_id:")
+    for entry in (sample_rows or [])[:5]:
+        print(f"  {entry.rpartition('|')[0]}")
@@ -0,0 +1,47 @@
+"""
+Shared PostgreSQL connection pool for the utility scripts
+"""
+import os
+from contextlib import contextmanager
+
+from psycopg2.pool import ThreadedConnectionPool
+from dotenv import load_dotenv
+
+# Load environment variables
+load_dotenv()
+
+DB_CONFIG = {
+    'host': os.getenv('DB_HOST', '127.0.0.1'),
+    'port': int(os.getenv('DB_PORT', 5432)),
+    'dbname': os.getenv('DB_NAME', 'kara_medical'),
+    'user': os.getenv('DB_USER', 'postgres'),
+    'password': os.getenv('DB_PASSWORD', 'your_secure_password')
+}
+
+# Scripts borrow connections from one pool instead of paying a fresh
+# TCP + auth handshake per psycopg2.connect; the pool also lets a
+# script fan work out over threads later without code changes
+_POOL = None
+
+def _get_pool():
+    """Get (or lazily create) the shared connection pool"""
+    global _POOL
+    if _POOL is None or _POOL.closed:
+        _POOL = ThreadedConnectionPool(minconn=1, maxconn=8, **DB_CONFIG)
+    return _POOL
+
+@contextmanager
+def get_conn():
+    """Borrow a pooled connection and return it when done"""
+    pool = _get_pool()
+    conn = pool.getconn()
+    try:
+        yield conn
+        if not conn.autocommit:
+            conn.commit()
+    except Exception:
+        if not conn.autocommit:
+            conn.rollback()
+        raise
+    finally:
+        pool.putconn(conn)
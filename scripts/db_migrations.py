@@ -0,0 +1,338 @@
+"""
+Apply analytics database migrations (materialized views, indexes, etc.)
+
+These objects sit on top of the dbt-built analytics schema, so run this
+after dbt has materialized the marts:
+    python scripts/db_migrations.py
+"""
+import psycopg2
+
+DB_CONFIG = {
+    "host": "127.0.0.1",
+    "port": 5432,
+    "dbname": "kara_medical",
+    "user": "postgres",
+    "password": "your_secure_password"
+}
+
+def partition_fact_table_sql(table, date_column):
+    """Build the DDL that converts a flat fact table into a monthly
+    range-partitioned table (no-op if it is already partitioned)"""
+    return f"""
+        DO $$
+        DECLARE
+            lower_bound date;
+            upper_bound date;
+            part_start date;
+        BEGIN
+            IF EXISTS (SELECT 1 FROM pg_partitioned_table pt
+                       JOIN pg_class c ON pt.partrelid = c.oid
+                       WHERE c.relname = '{table}'
+                       AND c.relnamespace = 'analytics'::regnamespace) THEN
+                RETURN;
+            END IF;
+
+            EXECUTE 'CREATE TABLE analytics.{table}_part '
+                    '(LIKE analytics.{table} INCLUDING ALL) '
+                    'PARTITION BY RANGE ({date_column})';
+
+            SELECT date_trunc('month', MIN({date_column}))::date,
+                   (date_trunc('month', MAX({date_column})) + interval '1 month')::date
+            INTO lower_bound, upper_bound
+            FROM analytics.{table};
+
+            IF lower_bound IS NULL THEN
+                lower_bound := date_trunc('month', CURRENT_DATE)::date;
+                upper_bound := (lower_bound + interval '1 month')::date;
+            END IF;
+
+            part_start := lower_bound;
+            WHILE part_start < upper_bound LOOP
+                EXECUTE format(
+                    'CREATE TABLE analytics.{table}_%s PARTITION OF analytics.{table}_part '
+                    'FOR VALUES FROM (%L) TO (%L)',
+                    to_char(part_start, 'YYYYMM'),
+                    part_start, (part_start + interval '1 month')::date
+                );
+                part_start := (part_start + interval '1 month')::date;
+            END LOOP;
+
+            -- Catch-all for rows outside the bounded monthly range -
+            -- above all for NULL {date_column}: raw dates are nullable
+            -- and the facts join them in via LEFT JOIN, so the backfill
+            -- would otherwise abort with "no partition found for row"
+            EXECUTE 'CREATE TABLE analytics.{table}_default '
+                    'PARTITION OF analytics.{table}_part DEFAULT';
+
+            EXECUTE 'INSERT INTO analytics.{table}_part SELECT * FROM analytics.{table}';
+            -- dbt rebuilds {table} flat on every build, so this branch
+            -- runs again next cycle; drop the previous cycle's _flat
+            -- leftover or the rename below collides with it
+            EXECUTE 'DROP TABLE IF EXISTS analytics.{table}_flat CASCADE';
+            EXECUTE 'ALTER TABLE analytics.{table} RENAME TO {table}_flat';
+            EXECUTE 'ALTER TABLE analytics.{table}_part RENAME TO {table}';
+        END $$;
+    """
+
+
+# Each migration is (name, sql). Statements are idempotent so the script
+# can be re-run safely after every dbt build.
+MIGRATIONS = [
+    ("mv_top_products", """
+        CREATE MATERIALIZED VIEW IF NOT EXISTS analytics.mv_top_products AS
+        SELECT
+            detected_object_class as object_class,
+            object_category,
+            total_detections,
+            messages_with_object,
+            channels_with_object,
+            avg_confidence,
+            frequency_category,
+            importance_score,
+            NOW() as updated_at
+        FROM analytics.dim_objects
+        WITH DATA;
+
+        CREATE UNIQUE INDEX IF NOT EXISTS ix_mv_top_products_class
+        ON analytics.mv_top_products (object_class);
+    """),
+    ("mv_engagement_daily", """
+        CREATE MATERIALIZED VIEW IF NOT EXISTS analytics.mv_engagement_daily AS
+        SELECT
+            dd.date_day as date,
+            COUNT(fm.message_id) as total_messages,
+            SUM(fm.view_count) as total_views,
+            SUM(fm.forward_count) as total_forwards,
+            SUM(fm.reply_count) as total_replies,
+            AVG(fm.engagement_score) as avg_engagement_score,
+            COUNT(*) FILTER (WHERE fm.engagement_score > 0.5) as high_engagement_messages,
+            NOW() as updated_at
+        FROM analytics.fct_messages fm
+        JOIN analytics.dim_dates dd ON fm.date_key = dd.date_key
+        GROUP BY dd.date_day
+        WITH DATA;
+
+        CREATE UNIQUE INDEX IF NOT EXISTS ix_mv_engagement_daily_date
+        ON analytics.mv_engagement_daily (date);
+    """),
+    ("mv_channel_summary", """
+        CREATE MATERIALIZED VIEW IF NOT EXISTS analytics.mv_channel_summary AS
+        SELECT
+            channel_name,
+            total_messages,
+            avg_views_per_message,
+            overall_forward_rate,
+            channel_activity_level,
+            NOW() as updated_at
+        FROM analytics.dim_channels
+        WITH DATA;
+
+        CREATE UNIQUE INDEX IF NOT EXISTS ix_mv_channel_summary_name
+        ON analytics.mv_channel_summary (channel_name);
+    """),
+    ("mv_summary_stats", """
+        CREATE MATERIALIZED VIEW IF NOT EXISTS analytics.mv_summary_stats AS
+        SELECT
+            1 as id,
+            COUNT(DISTINCT dc.channel_name) as total_channels,
+            COUNT(fm.message_id) as total_messages,
+            SUM(fm.view_count) as total_views,
+            SUM(fm.forward_count) as total_forwards,
+            AVG(fm.engagement_score) as avg_engagement_score,
+            COUNT(DISTINCT fid.detected_object_class) as unique_objects_detected,
+            COUNT(fid.detection_id) as total_detections,
+            NOW() as updated_at
+        FROM analytics.fct_messages fm
+        JOIN analytics.dim_channels dc ON fm.channel_key = dc.channel_key
+        LEFT JOIN analytics.fct_image_detections fid ON fm.message_id = fid.message_id
+        WITH DATA;
+
+        CREATE UNIQUE INDEX IF NOT EXISTS ix_mv_summary_stats_id
+        ON analytics.mv_summary_stats (id);
+    """),
+    ("telegram_messages_fulltext", """
+        ALTER TABLE raw.telegram_messages
+        ADD COLUMN IF NOT EXISTS tsv tsvector
+        GENERATED ALWAYS AS (to_tsvector('simple', coalesce(text, ''))) STORED;
+
+        CREATE INDEX IF NOT EXISTS ix_msg_tsv
+        ON raw.telegram_messages USING GIN (tsv);
+    """),
+    ("telegram_messages_trigram", """
+        CREATE EXTENSION IF NOT EXISTS pg_trgm;
+
+        CREATE INDEX IF NOT EXISTS ix_msg_text_trgm
+        ON raw.telegram_messages USING GIN (lower(text) gin_trgm_ops);
+    """),
+    ("raw_messages_quality_indexes", """
+        CREATE INDEX IF NOT EXISTS ix_raw_msg_date
+        ON raw.telegram_messages (date);
+
+        CREATE INDEX IF NOT EXISTS ix_raw_msg_views
+        ON raw.telegram_messages (views)
+        WHERE views IS NOT NULL;
+    """),
+    ("fact_table_indexes", """
+        CREATE INDEX IF NOT EXISTS ix_fct_msg_date_brin
+        ON analytics.fct_messages USING BRIN (message_date)
+        WITH (pages_per_range = 32);
+
+        CREATE INDEX IF NOT EXISTS ix_fct_msg_chan_date
+        ON analytics.fct_messages (channel_key, date_key)
+        INCLUDE (view_count, forward_count, reply_count, engagement_score);
+
+        CREATE INDEX IF NOT EXISTS ix_fct_det_chan_class
+        ON analytics.fct_image_detections (channel_key, detected_object_class)
+        INCLUDE (confidence_score);
+
+        ANALYZE analytics.fct_messages;
+        ANALYZE analytics.fct_image_detections;
+    """),
+    ("null_message_id_partial_index", """
+        -- Orphaned-detection checks filter on message_id IS NULL; the
+        -- partial index keeps those scans proportional to the NULL
+        -- rows rather than the whole table
+        CREATE INDEX IF NOT EXISTS ix_img_det_null_msg
+        ON raw.image_detections (channel_name)
+        WHERE message_id IS NULL;
+    """),
+    ("fct_messages_message_id_index", """
+        -- Anti-join support for the orphan-detection quality check:
+        -- NOT EXISTS probes against fct_messages.message_id
+        CREATE INDEX IF NOT EXISTS ix_fct_msg_message_id
+        ON analytics.fct_messages (message_id);
+    """),
+    ("high_engagement_partial_index", """
+        CREATE INDEX IF NOT EXISTS ix_fm_high_eng
+        ON analytics.fct_messages (date_key)
+        WHERE engagement_score > 0.5;
+    """),
+    ("rollup_engagement_daily", """
+        CREATE TABLE IF NOT EXISTS analytics.rollup_engagement_daily (
+            date_day DATE NOT NULL,
+            channel_key TEXT NOT NULL,
+            message_count BIGINT NOT NULL DEFAULT 0,
+            sum_views BIGINT NOT NULL DEFAULT 0,
+            sum_forwards BIGINT NOT NULL DEFAULT 0,
+            sum_replies BIGINT NOT NULL DEFAULT 0,
+            sum_engagement DOUBLE PRECISION NOT NULL DEFAULT 0,
+            n_high BIGINT NOT NULL DEFAULT 0,
+            PRIMARY KEY (date_day, channel_key)
+        );
+
+        CREATE OR REPLACE FUNCTION analytics.rollup_engagement_daily_upsert()
+        RETURNS trigger AS $fn$
+        BEGIN
+            INSERT INTO analytics.rollup_engagement_daily AS r
+                (date_day, channel_key, message_count, sum_views,
+                 sum_forwards, sum_replies, sum_engagement, n_high)
+            VALUES
+                (NEW.message_date::date, NEW.channel_key, 1,
+                 COALESCE(NEW.view_count, 0), COALESCE(NEW.forward_count, 0),
+                 COALESCE(NEW.reply_count, 0), COALESCE(NEW.engagement_score, 0),
+                 (COALESCE(NEW.engagement_score, 0) > 0.5)::int)
+            ON CONFLICT (date_day, channel_key) DO UPDATE SET
+                message_count = r.message_count + 1,
+                sum_views = r.sum_views + EXCLUDED.sum_views,
+                sum_forwards = r.sum_forwards + EXCLUDED.sum_forwards,
+                sum_replies = r.sum_replies + EXCLUDED.sum_replies,
+                sum_engagement = r.sum_engagement + EXCLUDED.sum_engagement,
+                n_high = r.n_high + EXCLUDED.n_high;
+            RETURN NEW;
+        END $fn$ LANGUAGE plpgsql;
+
+        DROP TRIGGER IF EXISTS trg_rollup_engagement_daily ON analytics.fct_messages;
+        CREATE TRIGGER trg_rollup_engagement_daily
+        AFTER INSERT ON analytics.fct_messages
+        FOR EACH ROW EXECUTE FUNCTION analytics.rollup_engagement_daily_upsert();
+
+        -- Rebuild from the facts: dbt full refreshes drop the trigger
+        -- along with the table, so the truncate keeps re-runs exact
+        TRUNCATE analytics.rollup_engagement_daily;
+        INSERT INTO analytics.rollup_engagement_daily
+        SELECT
+            dd.date_day,
+            fm.channel_key,
+            COUNT(*),
+            COALESCE(SUM(fm.view_count), 0),
+            COALESCE(SUM(fm.forward_count), 0),
+            COALESCE(SUM(fm.reply_count), 0),
+            COALESCE(SUM(fm.engagement_score), 0),
+            COUNT(*) FILTER (WHERE fm.engagement_score > 0.5)
+        FROM analytics.fct_messages fm
+        JOIN analytics.dim_dates dd ON fm.date_key = dd.date_key
+        GROUP BY dd.date_day, fm.channel_key;
+    """),
+    ("star_schema_constraints", """
+        DO $$
+        BEGIN
+            IF NOT EXISTS (SELECT 1 FROM pg_constraint
+                           WHERE conrelid = 'analytics.dim_channels'::regclass AND contype = 'p') THEN
+                ALTER TABLE analytics.dim_channels ADD PRIMARY KEY (channel_key);
+            END IF;
+            IF NOT EXISTS (SELECT 1 FROM pg_constraint
+                           WHERE conrelid = 'analytics.dim_dates'::regclass AND contype = 'p') THEN
+                ALTER TABLE analytics.dim_dates ADD PRIMARY KEY (date_key);
+            END IF;
+            IF NOT EXISTS (SELECT 1 FROM pg_constraint
+                           WHERE conrelid = 'analytics.dim_objects'::regclass AND contype = 'p') THEN
+                ALTER TABLE analytics.dim_objects ADD PRIMARY KEY (object_key);
+            END IF;
+            -- The FK guards check conrelid as well as conname: a stale
+            -- or renamed copy of the fact table (e.g. the partitioning
+            -- migration's _flat leftover) keeps the constraint name
+            -- alive, and a name-only check would then never re-add the
+            -- FKs to the current table
+            IF NOT EXISTS (SELECT 1 FROM pg_constraint
+                           WHERE conname = 'fk_fm_channel'
+                           AND conrelid = 'analytics.fct_messages'::regclass) THEN
+                ALTER TABLE analytics.fct_messages
+                ADD CONSTRAINT fk_fm_channel FOREIGN KEY (channel_key)
+                REFERENCES analytics.dim_channels NOT VALID;
+            END IF;
+            IF NOT EXISTS (SELECT 1 FROM pg_constraint
+                           WHERE conname = 'fk_fm_date'
+                           AND conrelid = 'analytics.fct_messages'::regclass) THEN
+                ALTER TABLE analytics.fct_messages
+                ADD CONSTRAINT fk_fm_date FOREIGN KEY (date_key)
+                REFERENCES analytics.dim_dates NOT VALID;
+            END IF;
+            IF NOT EXISTS (SELECT 1 FROM pg_constraint
+                           WHERE conname = 'fk_fid_channel'
+                           AND conrelid = 'analytics.fct_image_detections'::regclass) THEN
+                ALTER TABLE analytics.fct_image_detections
+                ADD CONSTRAINT fk_fid_channel FOREIGN KEY (channel_key)
+                REFERENCES analytics.dim_channels NOT VALID;
+            END IF;
+        END $$;
+
+        CREATE STATISTICS IF NOT EXISTS st_fct_msg_chan_date (dependencies)
+        ON channel_key, date_key FROM analytics.fct_messages;
+
+        ANALYZE analytics.fct_messages;
+    """),
+    ("partition_fct_messages",
+     partition_fact_table_sql("fct_messages", "message_date")),
+    ("partition_fct_image_detections",
+     partition_fact_table_sql("fct_image_detections", "message_date")),
+]
+
+
+def apply_migrations():
+    """Apply all migrations against the analytics database"""
+    conn = psycopg2.connect(**DB_CONFIG)
+    # Autocommit so index builds and DDL are not held in one big transaction
+    conn.autocommit = True
+
+    try:
+        with conn.cursor() as cur:
+            for name, sql in MIGRATIONS:
+                print(f"🔧 Applying migration: {name}")
+                cur.execute(sql)
+        print(f"✅ Applied {len(MIGRATIONS)} migrations")
+    finally:
+        conn.close()
+
+
+if __name__ == "__main__":
+    apply_migrations()
@@ -1,35 +1,29 @@
 import os
+import sys
 import json
-import psycopg2
+from concurrent.futures import ThreadPoolExecutor
+from itertools import chain
 from pathlib import Path
-from dotenv import load_dotenv
 
-# Load environment variables
-load_dotenv()
+try:
+    from psycopg2.extras import execute_values
+except ImportError:  # very old psycopg2 builds
+    execute_values = None
 
-DB_HOST = "127.0.0.1"
-DB_PORT = "5432"
-DB_NAME = "kara_medical"
-DB_USER = "postgres"
-DB_PASSWORD = "your_secure_password"
+sys.path.insert(0, str(Path(__file__).resolve().parent))
 
-RAW_DIR = Path("data/raw/telegram_messages/2025-07-14")
+from db import get_conn
 
-def connect_db():
-    """Connect to PostgreSQL database"""
-    try:
-        conn = psycopg2.connect(
-            host=DB_HOST,
-            port=DB_PORT,
-            dbname=DB_NAME,
-            user=DB_USER,
-            password=DB_PASSWORD
-        )
-        print(f"✅ Successfully connected to {DB_NAME}!")
-        return conn
-    except Exception as e:
-        print(f"❌ Failed to connect: {e}")
-        raise
+# orjson's Rust parser is several times faster than stdlib json on
+# these payloads; bind the loader once so the per-file path has no
+# availability branch
+try:
+    import orjson
+    _loads = orjson.loads
+except ImportError:
+    _loads = json.loads
+
+RAW_DIR = Path("data/raw/telegram_messages/2025-07-14")
 
 def create_table_if_not_exists(conn):
     with conn.cursor() as cur:
@@ -51,41 +45,82 @@ def create_table_if_not_exists(conn):
         conn.commit()
 
 def insert_messages(conn, messages):
+    # Batch the load: execute_values folds up to 1000 rows into each
+    # INSERT statement, so N messages cost a handful of round-trips
+    # instead of one parse + round-trip per row
+    rows = [
+        (
+            msg["id"],
+            msg["channel"],
+            msg["date"],
+            msg["text"],
+            msg["views"],
+            msg["forwards"],
+            msg["replies"],
+            msg["has_media"],
+            msg["scraped_at"]
+        )
+        for msg in messages
+    ]
     with conn.cursor() as cur:
-        for msg in messages:
-            cur.execute("""
-                INSERT INTO raw.telegram_messages (
+        # Stage through an UNLOGGED table: the hot write path skips WAL
+        # entirely (bulk ingest is fsync-bound, not CPU-bound), then one
+        # INSERT ... SELECT moves the batch into the logged table as a
+        # single sequential pass. synchronous_commit=off keeps the
+        # session from waiting on WAL flush - safe here because a crash
+        # just means re-running the load script.
+        cur.execute("SET synchronous_commit = off")
+        cur.execute("""
+            CREATE UNLOGGED TABLE IF NOT EXISTS raw.telegram_messages_stg
+            (LIKE raw.telegram_messages INCLUDING ALL)
+        """)
+        cur.execute("TRUNCATE raw.telegram_messages_stg")
+        if execute_values is not None:
+            execute_values(cur, """
+                INSERT INTO raw.telegram_messages_stg (
                     id, channel, date, text, views, forwards, replies, has_media, scraped_at
-                ) VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s)
-            """, (
-                msg["id"],
-                msg["channel"],
-                msg["date"],
-                msg["text"],
-                msg["views"],
-                msg["forwards"],
-                msg["replies"],
-                msg["has_media"],
-                msg["scraped_at"]
-            ))
-        conn.commit()
+                ) VALUES %s
+            """, rows, page_size=1000)
+        else:
+            # Per-row fallback: PREPARE once so the server skips
+            # parse+plan on every row, then EXECUTE by name
+            cur.execute("""
+                PREPARE ins_msg (int, text, timestamp, text, int, int, int, bool, timestamp)
+                AS INSERT INTO raw.telegram_messages_stg
+                VALUES ($1, $2, $3, $4, $5, $6, $7, $8, $9)
+            """)
+            cur.executemany(
+                "EXECUTE ins_msg (%s, %s, %s, %s, %s, %s, %s, %s, %s)",
+                rows
+            )
+            cur.execute("DEALLOCATE ins_msg")
+        cur.execute("""
+            INSERT INTO raw.telegram_messages
+            SELECT * FROM raw.telegram_messages_stg
+        """)
+        cur.execute("TRUNCATE raw.telegram_messages_stg")
+    conn.commit()
+
+def load_one(file):
+    """Read and decode a single JSON export"""
+    return _loads(file.read_bytes())["messages"]
 
 def load_files():
-    all_messages = []
-    for file in RAW_DIR.glob("*.json"):
-        with open(file, "r", encoding="utf-8") as f:
-            data = json.load(f)
-            all_messages.extend(data["messages"])
-    return all_messages
+    # Decode files concurrently: the thread pool overlaps disk reads
+    # and orjson parses several times faster than stdlib json, so a
+    # directory of exports loads in roughly the time of the largest
+    # file instead of the sum of all of them
+    with ThreadPoolExecutor(max_workers=16) as executor:
+        return list(chain.from_iterable(
+            executor.map(load_one, RAW_DIR.glob("*.json"))
+        ))
 
 if __name__ == "__main__":
-    conn = connect_db()
-    create_table_if_not_exists(conn)
-
     print("📥 Loading JSON files...")
     messages = load_files()
     print(f"📦 Total messages to insert: {len(messages)}")
 
-    insert_messages(conn, messages)
-    conn.close()
+    with get_conn() as conn:
+        create_table_if_not_exists(conn)
+        insert_messages(conn, messages)
     print("✅ Data loaded into raw.telegram_messages")
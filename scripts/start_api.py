@@ -9,8 +9,6 @@ import uvicorn
 project_root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
 sys.path.insert(0, project_root)
 
-from api.main import app
-
 if __name__ == "__main__":
     print("🚀 Starting Telegram Analytics API...")
     print("📚 API Documentation: http://localhost:8000/docs")
@@ -21,12 +19,21 @@ if __name__ == "__main__":
     print("💡 Press Ctrl+C to stop the server")
     print("="*50)
     
+    # Auto-reload stays behind DEV_RELOAD=1: the watchdog it spawns
+    # stats the whole tree continuously and forces a single worker. The
+    # default path runs one worker per core with uvloop + httptools (C
+    # event loop and HTTP parser). workers>1 requires the import-string
+    # app form, which is also why the module no longer imports app.
+    reload = os.getenv("DEV_RELOAD") == "1"
     try:
         uvicorn.run(
-            app,
+            "api.main:app",
             host="0.0.0.0",
             port=8000,
-            reload=True,
+            reload=reload,
+            workers=1 if reload else os.cpu_count(),
+            loop="uvloop",
+            http="httptools",
             log_level="info"
         )
     except KeyboardInterrupt:
@@ -1,40 +1,55 @@
 """
-Test API endpoints using requests
+Test API endpoints concurrently using aiohttp
 """
-import requests
+import asyncio
 import json
 import time
 
-def test_endpoint(url, description):
-    """Test a single endpoint"""
+import aiohttp
+
+async def test_endpoint(session, url, description, retries=3):
+    """Test a single endpoint, retrying transient failures
+
+    Mirrors urllib3's Retry(total=3, backoff_factor=0.1): waits 0.1s,
+    0.2s, 0.4s between attempts so a server still warming up doesn't
+    fail the whole suite.
+    """
     try:
-        start_time = time.time()
-        response = requests.get(url, timeout=10)
-        end_time = time.time()
+        for attempt in range(retries + 1):
+            try:
+                start_time = time.perf_counter()
+                async with session.get(url) as response:
+                    text = await response.text()
+                    elapsed = time.perf_counter() - start_time
+                break
+            except aiohttp.ClientError:
+                if attempt == retries:
+                    raise
+                await asyncio.sleep(0.1 * (2 ** attempt))
         
-        if response.status_code == 200:
-            data = response.json()
-            print(f"✅ {description}")
-            print(f"   Status: {response.status_code}")
-            print(f"   Response time: {end_time - start_time:.2f}s")
+        if response.status == 200:
+            data = json.loads(text)
+            lines = [f"✅ {description}",
+                     f"   Status: {response.status}",
+                     f"   Response time: {elapsed:.2f}s"]
             if 'data' in data:
-                print(f"   Records: {len(data['data'])}")
-            print()
+                lines.append(f"   Records: {len(data['data'])}")
+            print("\n".join(lines) + "\n")
             return True
         else:
-            print(f"❌ {description}")
-            print(f"   Status: {response.status_code}")
-            print(f"   Error: {response.text}")
-            print()
+            print(f"❌ {description}\n   Status: {response.status}\n   Error: {text}\n")
             return False
     except Exception as e:
-        print(f"❌ {description}")
-        print(f"   Error: {e}")
-        print()
+        print(f"❌ {description}\n   Error: {e}\n")
         return False
 
-def test_api_endpoints():
-    """Test all API endpoints"""
+async def test_api_endpoints():
+    """Test all API endpoints concurrently
+
+    The requests fan out under asyncio.gather over one keep-alive
+    connection pool, so the run takes roughly the slowest endpoint's
+    latency instead of the sum of all eleven.
+    """
     base_url = "http://localhost:8000"
     
     print("=== Testing Telegram Analytics API Endpoints ===\n")
@@ -53,12 +68,16 @@ def test_api_endpoints():
         (f"{base_url}/api/stats/summary", "Summary Statistics"),
     ]
     
-    passed = 0
     total = len(tests)
     
-    for url, description in tests:
-        if test_endpoint(url, description):
-            passed += 1
+    timeout = aiohttp.ClientTimeout(total=10)
+    connector = aiohttp.TCPConnector(limit=16)
+    async with aiohttp.ClientSession(timeout=timeout, connector=connector) as session:
+        results = await asyncio.gather(*[
+            test_endpoint(session, url, description)
+            for url, description in tests
+        ])
+    passed = sum(results)
     
     print(f"📊 Test Results: {passed}/{total} endpoints passed")
     
@@ -67,9 +86,31 @@ def test_api_endpoints():
     else:
         print("⚠️  Some endpoints failed. Check the server logs for details.")
 
-if __name__ == "__main__":
-    print("🧪 Make sure the API server is running on http://localhost:8000")
+async def _wait_ready(base_url, timeout=30.0):
+    """Poll /health until the server answers instead of blocking on stdin
+
+    Makes the script usable unattended (CI, pipelines): readiness costs
+    at most the server's real startup time, not a human keypress.
+    """
+    deadline = time.monotonic() + timeout
+    probe_timeout = aiohttp.ClientTimeout(total=0.5)
+    async with aiohttp.ClientSession(timeout=probe_timeout) as session:
+        while time.monotonic() < deadline:
+            try:
+                async with session.get(f"{base_url}/health"):
+                    return True
+            except Exception:
+                await asyncio.sleep(0.1)
+    return False
+
+async def _main():
+    base_url = "http://localhost:8000"
+    print("🧪 Waiting for the API server on " + base_url)
     print("💡 Start server with: python start_api.py")
-    input("Press Enter when server is ready...")
-    
-    test_api_endpoints()
+    if not await _wait_ready(base_url):
+        print("❌ Server did not become ready within 30s")
+        return
+    await test_api_endpoints()
+
+if __name__ == "__main__":
+    asyncio.run(_main())
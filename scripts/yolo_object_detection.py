@@ -5,16 +5,35 @@ and stores detection results in the database.
 """
 
 import os
+import io
+import re
+import csv
 import json
+import mmap
+import queue
+import threading
 import psycopg2
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+from psycopg2.extras import execute_values
+from psycopg2.pool import ThreadedConnectionPool
 from pathlib import Path
 from datetime import datetime
 from typing import List, Dict, Any
 import logging
+import numpy as np
 from ultralytics import YOLO
 from PIL import Image
 import hashlib
 
+# blake3's Rust implementation (SIMD, GIL-released) hashes several
+# times faster than md5; image_hash is identity-only, so the swap is
+# safe. md5 remains the fallback if the wheel isn't installed.
+try:
+    from blake3 import blake3
+except ImportError:
+    blake3 = None
+
 # Configure logging
 logging.basicConfig(
     level=logging.INFO,
@@ -33,20 +52,58 @@ DB_PASSWORD = "your_secure_password"
 IMAGE_EXTENSIONS = {'.jpg', '.jpeg', '.png', '.bmp', '.gif', '.tiff', '.webp'}
 CONFIDENCE_THRESHOLD = 0.3
 IMAGES_DIR = Path("data/raw/telegram_images")
+BATCH_SIZE = 16  # Images per YOLO forward pass
+FLUSH_THRESHOLD = 500  # Buffered detection rows per database flush
+COPY_THRESHOLD = 100  # Flushes at least this big go through COPY
+
+# Compiled once at import; the per-image path previously re-imported re
+# and rebuilt the channel list on every call
+_MSG_ID_RE = re.compile(r'(\d+)')
+_CHANNELS = frozenset({'CheMed123', 'lobelia4cosmetics', 'tikvahpharma'})
+
+# Model input size; images are pre-resized to this once on the CPU side
+YOLO_IMGSZ = 640
+
+
+def _load_image(path: Path) -> np.ndarray:
+    """Decode and pre-resize one image for the model
+
+    Handing the model pre-sized arrays instead of paths moves decode and
+    resize off the inference thread - Pillow releases the GIL, so the
+    decode pool in process_all_images overlaps this work with the GPU.
+    Installing pillow-simd (drop-in PIL replacement with SIMD
+    resize/decode) accelerates this path further with no code change.
+    """
+    with Image.open(path) as im:
+        arr = np.asarray(
+            im.convert('RGB').resize((YOLO_IMGSZ, YOLO_IMGSZ), Image.BILINEAR)
+        )
+    return arr[:, :, ::-1]  # Ultralytics expects BGR for array inputs
 
 
 class ImageDetectionProcessor:
     """Handles YOLO object detection for Telegram images"""
     
     def __init__(self):
-        self.db_conn = None
+        self.pool = None
         self.yolo_model = None
+        self.model_version = 'yolov8n'
+        self.device = 'cpu'
         self.processed_images = set()
+        self._prepared_conns = set()
         
     def connect_db(self):
-        """Connect to PostgreSQL database"""
+        """Open the PostgreSQL connection pool
+
+        A ThreadedConnectionPool instead of one shared connection: the
+        hashing prefilter, the inference thread and the writer thread
+        each check out their own connection, so concurrent stages stop
+        serializing on a single libpq socket.
+        """
         try:
-            self.db_conn = psycopg2.connect(
+            self.pool = ThreadedConnectionPool(
+                minconn=2,
+                maxconn=8,
                 host=DB_HOST,
                 port=DB_PORT,
                 dbname=DB_NAME,
@@ -57,12 +114,60 @@ class ImageDetectionProcessor:
         except Exception as e:
             logger.error(f"❌ Database connection failed: {e}")
             raise
+
+    @contextmanager
+    def _db(self):
+        """Check a pooled connection out for one unit of work
+
+        Commits on success, rolls back on error, and always returns
+        the connection to the pool (same contract as scripts/db.py).
+        """
+        conn = self.pool.getconn()
+        try:
+            yield conn
+            if not conn.autocommit:
+                conn.commit()
+        except Exception:
+            conn.rollback()
+            raise
+        finally:
+            self.pool.putconn(conn)
     
     def initialize_yolo(self):
-        """Initialize YOLOv8 model"""
+        """Initialize YOLOv8 model
+
+        On CUDA hosts the PyTorch weights are exported once to a
+        TensorRT FP16 engine sized for the batch path; every later run
+        loads the cached .engine directly. CPU hosts (no TensorRT)
+        keep the plain .pt model.
+        """
         try:
+            import torch
+            # Pinning the device (and FP16 below) keeps inference off
+            # the FP32 default, which leaves Tensor Cores idle on GPU
+            self.device = 0 if torch.cuda.is_available() else 'cpu'
+            if torch.cuda.is_available():
+                try:
+                    engine_path = Path('yolov8n.engine')
+                    if not engine_path.exists():
+                        logger.info("🚀 Exporting YOLOv8 to TensorRT FP16 (one-time)...")
+                        YOLO('yolov8n.pt').export(
+                            format='engine',
+                            imgsz=640,
+                            half=True,
+                            dynamic=True,
+                            batch=BATCH_SIZE,
+                            device=0
+                        )
+                    self.yolo_model = YOLO(str(engine_path))
+                    self.model_version = 'yolov8n-trt-fp16'
+                    logger.info("✅ TensorRT FP16 engine loaded")
+                    return
+                except Exception as e:
+                    logger.warning(f"⚠️  TensorRT engine unavailable, falling back to .pt: {e}")
             logger.info("🚀 Loading YOLOv8 model...")
             self.yolo_model = YOLO('yolov8n.pt')  # Using nano model for speed
+            self.model_version = 'yolov8n'
             logger.info("✅ YOLOv8 model loaded successfully")
         except Exception as e:
             logger.error(f"❌ Failed to load YOLO model: {e}")
@@ -86,39 +191,154 @@ class ImageDetectionProcessor:
                 detection_date TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
                 model_version TEXT DEFAULT 'yolov8n'
             );
-            
-            CREATE INDEX IF NOT EXISTS idx_image_detections_message_id 
-            ON raw.image_detections(message_id);
-            
-            CREATE INDEX IF NOT EXISTS idx_image_detections_image_hash 
-            ON raw.image_detections(image_hash);
-            
-            CREATE INDEX IF NOT EXISTS idx_image_detections_object_class 
-            ON raw.image_detections(detected_object_class);
+
+            -- One row per processed image hash; the PRIMARY KEY lets
+            -- ON CONFLICT DO NOTHING stand in for check-then-insert
+            CREATE TABLE IF NOT EXISTS raw.image_detection_runs (
+                image_hash VARCHAR(64) PRIMARY KEY,
+                processed_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+            );
         """
-        
+
+        # Built CONCURRENTLY so a cold start against a populated table
+        # doesn't take write locks that stall other pipeline instances.
+        # CONCURRENTLY can't run inside a transaction, hence autocommit
+        # and one statement per execute. The partial channel index only
+        # covers non-NULL rows, which is all the summary query reads.
+        index_sqls = (
+            """CREATE INDEX CONCURRENTLY IF NOT EXISTS idx_image_detections_message_id
+               ON raw.image_detections(message_id)""",
+            """CREATE INDEX CONCURRENTLY IF NOT EXISTS idx_image_detections_image_hash
+               ON raw.image_detections(image_hash)""",
+            """CREATE INDEX CONCURRENTLY IF NOT EXISTS idx_image_detections_object_class
+               ON raw.image_detections(detected_object_class)""",
+            """CREATE INDEX CONCURRENTLY IF NOT EXISTS idx_image_detections_channel
+               ON raw.image_detections(channel_name)
+               WHERE channel_name IS NOT NULL""",
+        )
+
         try:
-            with self.db_conn.cursor() as cur:
-                cur.execute(create_table_sql)
-                self.db_conn.commit()
+            with self._db() as conn:
+                with conn.cursor() as cur:
+                    cur.execute(create_table_sql)
+                conn.commit()
+                conn.autocommit = True
+                try:
+                    with conn.cursor() as cur:
+                        for index_sql in index_sqls:
+                            cur.execute(index_sql)
+                finally:
+                    conn.autocommit = False
             logger.info("✅ Image detections table created/verified")
         except Exception as e:
             logger.error(f"❌ Failed to create detections table: {e}")
             raise
     
     def get_image_hash(self, image_path: Path) -> str:
-        """Generate hash for image to avoid reprocessing"""
+        """Generate hash for image to avoid reprocessing
+
+        blake3 digests the file straight off an mmap in native code;
+        otherwise the file is mmap'd and fed to md5 in 1 MiB slices.
+        Both release the GIL while digesting, so the hashing threads in
+        process_all_images run in parallel. Digests are 32 hex chars
+        either way, so they share the VARCHAR(64) column (blake3 output
+        is truncated to 16 bytes - plenty for identity checks).
+        """
         try:
+            if blake3 is not None:
+                return blake3().update_mmap(image_path).hexdigest(length=16)
+            h = hashlib.md5()
             with open(image_path, 'rb') as f:
-                return hashlib.md5(f.read()).hexdigest()
+                with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+                    for i in range(0, len(mm), 1 << 20):
+                        h.update(mm[i:i + (1 << 20)])
+            return h.hexdigest()
         except Exception as e:
             logger.error(f"❌ Failed to hash image {image_path}: {e}")
             return ""
     
+    def claim_hashes(self, hashes: List[str]) -> set:
+        """Atomically claim unprocessed hashes via the run-marker table
+
+        INSERT ... ON CONFLICT DO NOTHING RETURNING collapses the
+        check-then-insert dance into one statement: a hash comes back
+        only if this run is the first to claim it, so restarts (and
+        concurrent runs) skip finished work without any SELECT.
+        """
+        if not hashes:
+            return set()
+        try:
+            with self._db() as conn:
+                with conn.cursor() as cur:
+                    rows = execute_values(
+                        cur,
+                        "INSERT INTO raw.image_detection_runs (image_hash) VALUES %s "
+                        "ON CONFLICT (image_hash) DO NOTHING RETURNING image_hash",
+                        [(h,) for h in hashes],
+                        page_size=1000,
+                        fetch=True
+                    )
+                    return {r[0] for r in rows}
+        except Exception as e:
+            logger.error(f"❌ Failed to claim hashes: {e}")
+            # Fall back to the read-only check so the run can proceed
+            self.load_processed_hashes(hashes)
+            return {h for h in hashes if h not in self.processed_images}
+
+    def _unclaim_hashes(self, hashes, conn=None):
+        """Release claimed hashes after a failure
+
+        Claims happen before inference, so a decode, inference or flush
+        error would otherwise leave its images marked processed forever;
+        deleting the marker rows keeps failures retryable on the next
+        run, matching the old check-then-insert behaviour.
+        """
+        hashes = list(hashes)
+        if not hashes:
+            return
+        try:
+            if conn is not None:
+                with conn.cursor() as cur:
+                    cur.execute(
+                        "DELETE FROM raw.image_detection_runs WHERE image_hash = ANY(%s)",
+                        (hashes,)
+                    )
+                conn.commit()
+            else:
+                with self._db() as pooled, pooled.cursor() as cur:
+                    cur.execute(
+                        "DELETE FROM raw.image_detection_runs WHERE image_hash = ANY(%s)",
+                        (hashes,)
+                    )
+        except Exception as e:
+            logger.error(f"❌ Failed to release claimed hashes: {e}")
+
+    def load_processed_hashes(self, hashes: List[str]):
+        """Bulk-check which hashes already have detections
+
+        One SELECT with ANY over the whole candidate list replaces a
+        per-image COUNT(*) round-trip; hits land in
+        self.processed_images for set-membership checks afterwards.
+        """
+        if not hashes:
+            return
+        try:
+            with self._db() as conn, conn.cursor() as cur:
+                cur.execute(
+                    "SELECT DISTINCT image_hash FROM raw.image_detections "
+                    "WHERE image_hash = ANY(%s)",
+                    (hashes,)
+                )
+                self.processed_images.update(row[0] for row in cur.fetchall())
+        except Exception as e:
+            logger.error(f"❌ Failed to load processed hashes: {e}")
+
     def is_image_processed(self, image_hash: str) -> bool:
         """Check if image has already been processed"""
+        if image_hash in self.processed_images:
+            return True
         try:
-            with self.db_conn.cursor() as cur:
+            with self._db() as conn, conn.cursor() as cur:
                 cur.execute(
                     "SELECT COUNT(*) FROM raw.image_detections WHERE image_hash = %s",
                     (image_hash,)
@@ -129,44 +349,88 @@ class ImageDetectionProcessor:
             logger.error(f"❌ Failed to check if image processed: {e}")
             return False
     
+    def _parse_image_path(self, image_path: Path) -> tuple:
+        """Extract candidate message ID and channel from the path (no DB)"""
+        channel_name = next(
+            (part for part in image_path.parts if part in _CHANNELS), None
+        )
+        if not channel_name:
+            return None, None
+
+        # Look for patterns like "message_123" or just numbers
+        match = _MSG_ID_RE.search(image_path.stem)
+        if match:
+            return int(match.group(1)), channel_name
+        return None, channel_name
+
+    def _validate_message_ids(self, candidates: List[tuple]) -> set:
+        """Verify (message_id, channel) candidates in a single query"""
+        if not candidates:
+            return set()
+        try:
+            with self._db() as conn, conn.cursor() as cur:
+                cur.execute(
+                    "SELECT id, channel FROM raw.telegram_messages "
+                    "WHERE id = ANY(%s) AND channel = ANY(%s)",
+                    ([c[0] for c in candidates], [c[1] for c in candidates])
+                )
+                return set(cur.fetchall())
+        except Exception as e:
+            logger.error(f"❌ Failed to validate message IDs: {e}")
+            return set()
+
     def get_message_id_for_image(self, image_path: Path) -> tuple:
         """Extract message ID and channel from image path"""
         try:
-            # Extract channel name from path
-            path_parts = image_path.parts
-            channel_name = None
-            
-            for part in path_parts:
-                if part in ['CheMed123', 'lobelia4cosmetics', 'tikvahpharma']:
-                    channel_name = part
-                    break
-            
-            if not channel_name:
-                return None, None
-            
-            # Try to extract message ID from filename
-            filename = image_path.stem
-            # Look for patterns like "message_123" or just numbers
-            import re
-            match = re.search(r'(\d+)', filename)
-            if match:
-                potential_message_id = int(match.group(1))
-                
+            potential_message_id, channel_name = self._parse_image_path(image_path)
+            if potential_message_id is not None:
                 # Verify this message ID exists in our database
-                with self.db_conn.cursor() as cur:
-                    cur.execute(
-                        "SELECT id FROM raw.telegram_messages WHERE id = %s AND channel = %s",
-                        (potential_message_id, channel_name)
-                    )
-                    result = cur.fetchone()
-                    if result:
-                        return potential_message_id, channel_name
-            
+                if (potential_message_id, channel_name) in \
+                        self._validate_message_ids([(potential_message_id, channel_name)]):
+                    return potential_message_id, channel_name
             return None, channel_name
         except Exception as e:
             logger.error(f"❌ Failed to get message ID for {image_path}: {e}")
             return None, None
     
+    def _extract_detections(self, result, image_path: Path, image_hash: str,
+                            message_id, channel_name) -> List[Dict[str, Any]]:
+        """Build detection dicts from one YOLO result
+
+        Pulls the boxes off the device in three bulk transfers (xyxy,
+        conf, cls) rather than one GPU sync per scalar - indexing
+        box.conf[0] etc. forces a device round-trip for every single
+        float.
+        """
+        boxes = result.boxes
+        if boxes is None or len(boxes) == 0:
+            return []
+
+        xyxy = boxes.xyxy.cpu().numpy()
+        confs = boxes.conf.cpu().numpy()
+        classes = boxes.cls.cpu().numpy().astype(int)
+        # result.names is a dict[int, str]; a tuple indexed by class id
+        # turns the per-detection lookup into C-level sequence indexing
+        # instead of hashing an int for every box
+        names = tuple(result.names[i] for i in sorted(result.names))
+        path_str = str(image_path)
+
+        detections = []
+        for i in range(len(confs)):
+            detections.append({
+                'image_path': path_str,
+                'image_hash': image_hash,
+                'message_id': message_id,
+                'channel_name': channel_name,
+                'detected_object_class': names[classes[i]],
+                'confidence_score': float(confs[i]),
+                'bbox_x1': float(xyxy[i][0]),
+                'bbox_y1': float(xyxy[i][1]),
+                'bbox_x2': float(xyxy[i][2]),
+                'bbox_y2': float(xyxy[i][3])
+            })
+        return detections
+
     def process_image(self, image_path: Path) -> List[Dict[str, Any]]:
         """Process single image with YOLO detection"""
         try:
@@ -174,165 +438,357 @@ class ImageDetectionProcessor:
             image_hash = self.get_image_hash(image_path)
             if not image_hash:
                 return []
-            
+
             # Check if already processed
             if self.is_image_processed(image_hash):
                 logger.info(f"⏭️  Skipping already processed image: {image_path.name}")
                 return []
-            
+
             # Get message ID and channel
             message_id, channel_name = self.get_message_id_for_image(image_path)
-            
-            # Run YOLO detection
-            results = self.yolo_model(str(image_path), conf=CONFIDENCE_THRESHOLD)
-            
+
+            # Run YOLO detection; stream=True yields results lazily so
+            # prediction tensors free as soon as each is consumed
+            results = self.yolo_model(
+                str(image_path),
+                conf=CONFIDENCE_THRESHOLD,
+                stream=True,
+                device=self.device,
+                half=self.device != 'cpu',
+                verbose=False
+            )
+
             detections = []
             for result in results:
-                boxes = result.boxes
-                if boxes is not None:
-                    for box in boxes:
-                        # Extract detection data
-                        detection = {
-                            'image_path': str(image_path),
-                            'image_hash': image_hash,
-                            'message_id': message_id,
-                            'channel_name': channel_name,
-                            'detected_object_class': result.names[int(box.cls[0])],
-                            'confidence_score': float(box.conf[0]),
-                            'bbox_x1': float(box.xyxy[0][0]),
-                            'bbox_y1': float(box.xyxy[0][1]),
-                            'bbox_x2': float(box.xyxy[0][2]),
-                            'bbox_y2': float(box.xyxy[0][3])
-                        }
-                        detections.append(detection)
-            
+                detections.extend(self._extract_detections(
+                    result, image_path, image_hash, message_id, channel_name
+                ))
+
             logger.info(f"🔍 Found {len(detections)} objects in {image_path.name}")
             return detections
-            
+
         except Exception as e:
             logger.error(f"❌ Failed to process image {image_path}: {e}")
             return []
     
-    def save_detections(self, detections: List[Dict[str, Any]]):
-        """Save detection results to database"""
-        if not detections:
+    def _ensure_prepared(self, conn):
+        """PREPARE the detection insert once per connection
+
+        EXECUTE then skips server-side parse/plan on every later flush.
+        Prepared statements are session-scoped, so the main connection
+        and the writer thread's connection each prepare their own.
+        """
+        if id(conn) in self._prepared_conns:
             return
-        
-        insert_sql = """
-            INSERT INTO raw.image_detections (
-                image_path, image_hash, message_id, channel_name,
-                detected_object_class, confidence_score,
-                bbox_x1, bbox_y1, bbox_x2, bbox_y2
-            ) VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s, %s)
+        with conn.cursor() as cur:
+            cur.execute("""
+                PREPARE ins_det (text, varchar, integer, text, text, float8,
+                                 float8, float8, float8, float8, text) AS
+                INSERT INTO raw.image_detections (
+                    image_path, image_hash, message_id, channel_name,
+                    detected_object_class, confidence_score,
+                    bbox_x1, bbox_y1, bbox_x2, bbox_y2, model_version
+                ) VALUES ($1, $2, $3, $4, $5, $6, $7, $8, $9, $10, $11)
+                ON CONFLICT DO NOTHING
+            """)
+        self._prepared_conns.add(id(conn))
+
+    def save_detections(self, detections: List[Dict[str, Any]], conn=None):
+        """Save detection results to database
+
+        Large flushes stream through COPY FROM STDIN - Postgres's bulk
+        ingestion path, which skips per-statement parse/plan entirely.
+        Small flushes (< COPY_THRESHOLD rows) go through a prepared
+        statement: COPY's setup overhead isn't worth it there, and
+        EXECUTE reuses the plan parsed once per session.
         """
-        
+        if not detections:
+            return
+        if conn is None:
+            # Callers without a checked-out connection draw one from
+            # the pool for the duration of the flush
+            with self._db() as pooled:
+                self.save_detections(detections, conn=pooled)
+            return
+
+        rows = [
+            (
+                detection['image_path'],
+                detection['image_hash'],
+                detection['message_id'],
+                detection['channel_name'],
+                detection['detected_object_class'],
+                detection['confidence_score'],
+                detection['bbox_x1'],
+                detection['bbox_y1'],
+                detection['bbox_x2'],
+                detection['bbox_y2'],
+                self.model_version
+            )
+            for detection in detections
+        ]
+
         try:
-            with self.db_conn.cursor() as cur:
-                for detection in detections:
-                    cur.execute(insert_sql, (
-                        detection['image_path'],
-                        detection['image_hash'],
-                        detection['message_id'],
-                        detection['channel_name'],
-                        detection['detected_object_class'],
-                        detection['confidence_score'],
-                        detection['bbox_x1'],
-                        detection['bbox_y1'],
-                        detection['bbox_x2'],
-                        detection['bbox_y2']
-                    ))
-                self.db_conn.commit()
+            with conn.cursor() as cur:
+                if len(rows) >= COPY_THRESHOLD:
+                    buf = io.StringIO()
+                    csv.writer(buf).writerows(rows)
+                    buf.seek(0)
+                    cur.copy_expert(
+                        """
+                        COPY raw.image_detections (
+                            image_path, image_hash, message_id, channel_name,
+                            detected_object_class, confidence_score,
+                            bbox_x1, bbox_y1, bbox_x2, bbox_y2, model_version
+                        ) FROM STDIN WITH (FORMAT CSV)
+                        """,
+                        buf
+                    )
+                else:
+                    self._ensure_prepared(conn)
+                    cur.executemany(
+                        "EXECUTE ins_det (%s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s)",
+                        rows
+                    )
+                conn.commit()
             logger.info(f"✅ Saved {len(detections)} detections to database")
         except Exception as e:
             logger.error(f"❌ Failed to save detections: {e}")
-            self.db_conn.rollback()
+            conn.rollback()
+            # The rows never landed; give their hashes back so the next
+            # run retries these images
+            self._unclaim_hashes({d['image_hash'] for d in detections}, conn=conn)
     
-    def find_images(self) -> List[Path]:
-        """Find all images in the telegram images directory"""
+    def find_images(self, channel: str = None) -> List[Path]:
+        """Find all images, optionally restricted to one channel folder
+
+        Walks with os.scandir, whose DirEntry objects carry the file
+        type from the directory read itself - no extra stat() per entry
+        the way rglob + is_file() incurs. Path objects are built only
+        for entries that are actually images.
+        """
         images = []
-        
-        if not IMAGES_DIR.exists():
-            logger.warning(f"⚠️  Images directory not found: {IMAGES_DIR}")
+
+        search_dir = IMAGES_DIR / channel if channel else IMAGES_DIR
+        if not search_dir.exists():
+            logger.warning(f"⚠️  Images directory not found: {search_dir}")
             return images
-        
-        for image_path in IMAGES_DIR.rglob("*"):
-            if image_path.is_file() and image_path.suffix.lower() in IMAGE_EXTENSIONS:
-                images.append(image_path)
-        
+
+        stack = [str(search_dir)]
+        while stack:
+            current = stack.pop()
+            try:
+                with os.scandir(current) as entries:
+                    for entry in entries:
+                        if entry.is_dir(follow_symlinks=False):
+                            stack.append(entry.path)
+                        elif entry.is_file(follow_symlinks=False):
+                            dot = entry.name.rfind('.')
+                            if dot != -1 and entry.name[dot:].lower() in IMAGE_EXTENSIONS:
+                                images.append(Path(entry.path))
+            except OSError as e:
+                logger.warning(f"⚠️  Could not scan {current}: {e}")
+
         logger.info(f"📁 Found {len(images)} images to process")
         return images
     
-    def process_all_images(self):
-        """Process all images in the directory"""
-        images = self.find_images()
-        
+    def process_all_images(self, channel: str = None):
+        """Process all images in the directory (or one channel's folder)
+
+        Images run through YOLO in batches of BATCH_SIZE: one forward
+        pass per chunk amortizes model dispatch overhead that a
+        per-image call pays every time.
+        """
+        images = self.find_images(channel)
+
         if not images:
             logger.info("🔍 No images found to process")
             return
-        
+
+        # Hash everything first (threaded - md5 releases the GIL), then
+        # one INSERT ... ON CONFLICT claims the unprocessed hashes so
+        # none of the finished ones reach the model
+        with ThreadPoolExecutor(max_workers=os.cpu_count()) as pool:
+            hashes = list(pool.map(self.get_image_hash, images))
+        hashed = [(p, h) for p, h in zip(images, hashes) if h]
+        claimed = self.claim_hashes(list({h for _, h in hashed}))
+
+        # Parse paths without touching the DB, then verify every
+        # (message_id, channel) candidate in one query instead of a
+        # SELECT per image
+        parsed = []
+        for image_path, image_hash in hashed:
+            if image_hash not in claimed:
+                logger.info(f"⏭️  Skipping already processed image: {image_path.name}")
+                continue
+            candidate_id, channel_name = self._parse_image_path(image_path)
+            parsed.append((image_path, image_hash, candidate_id, channel_name))
+
+        valid_ids = self._validate_message_ids(
+            [(c, ch) for _, _, c, ch in parsed if c is not None and ch]
+        )
+        pending = [
+            (path, h, c if (c, ch) in valid_ids else None, ch)
+            for path, h, c, ch in parsed
+        ]
+
+        # Channels repost the same image constantly; group by hash and
+        # run YOLO once per unique content, fanning the detection rows
+        # out to every copy on insert
+        by_hash: Dict[str, List[tuple]] = {}
+        for item in pending:
+            by_hash.setdefault(item[1], []).append(item)
+        unique = [items[0] for items in by_hash.values()]
+        if len(unique) < len(pending):
+            logger.info(
+                f"♻️  {len(pending) - len(unique)} images are repost duplicates; "
+                f"running YOLO on {len(unique)} unique images"
+            )
+
         processed_count = 0
         total_detections = 0
-        
-        for image_path in images:
+        # Inference and database writes overlap: the main thread keeps
+        # the model busy while a writer thread drains flushed batches
+        # onto its own pooled connection (libpq serializes on one
+        # socket, so sharing a single connection would re-serialize the
+        # two stages). maxsize bounds memory if the DB falls behind.
+        flush_queue: queue.Queue = queue.Queue(maxsize=4)
+
+        def _writer():
+            # Held for the whole run so the prepared insert statement
+            # survives across flushes
+            conn = self.pool.getconn()
             try:
-                detections = self.process_image(image_path)
-                if detections:
-                    self.save_detections(detections)
-                    total_detections += len(detections)
-                    processed_count += 1
-            except Exception as e:
-                logger.error(f"❌ Error processing {image_path}: {e}")
-                continue
-        
+                while True:
+                    batch = flush_queue.get()
+                    if batch is None:
+                        break
+                    self.save_detections(batch, conn=conn)
+            finally:
+                self.pool.putconn(conn)
+
+        writer = threading.Thread(target=_writer, name="detection-writer")
+        writer.start()
+
+        # Detections buffer across images; flushing every ~FLUSH_THRESHOLD
+        # rows keeps commits rare without holding the whole run in memory
+        buffer: List[Dict[str, Any]] = []
+
+        decode_pool = ThreadPoolExecutor(max_workers=os.cpu_count())
+        try:
+            for start in range(0, len(unique), BATCH_SIZE):
+                chunk = unique[start:start + BATCH_SIZE]
+                try:
+                    # Decode/resize the whole chunk in parallel threads
+                    # while the previous chunk is still on the GPU
+                    imgs = list(decode_pool.map(
+                        _load_image, [item[0] for item in chunk]
+                    ))
+                    # stream=True keeps results a generator: each
+                    # image's prediction tensors are released as the
+                    # zip below consumes them, so GPU memory stays flat
+                    # no matter how many images the run covers
+                    results = self.yolo_model(
+                        imgs,
+                        conf=CONFIDENCE_THRESHOLD,
+                        stream=True,
+                        device=self.device,
+                        half=self.device != 'cpu',
+                        verbose=False
+                    )
+                    for (image_path, image_hash, message_id, channel_name), result \
+                            in zip(chunk, results):
+                        rep_detections = self._extract_detections(
+                            result, image_path, image_hash, message_id, channel_name
+                        )
+                        logger.info(f"🔍 Found {len(rep_detections)} objects in {image_path.name}")
+                        detections = list(rep_detections)
+                        # Duplicate copies reuse the representative's
+                        # detections under their own path/message
+                        for dup_path, _, dup_msg, dup_chan in by_hash[image_hash][1:]:
+                            detections.extend(
+                                dict(d, image_path=str(dup_path),
+                                     message_id=dup_msg, channel_name=dup_chan)
+                                for d in rep_detections
+                            )
+                        if detections:
+                            buffer.extend(detections)
+                            total_detections += len(detections)
+                            processed_count += len(by_hash[image_hash])
+                    if len(buffer) >= FLUSH_THRESHOLD:
+                        flush_queue.put(buffer)
+                        buffer = []
+                except Exception as e:
+                    logger.error(f"❌ Error processing batch starting at {chunk[0][0]}: {e}")
+                    # One bad file voids the whole chunk (decode and
+                    # inference are batched); unclaim it so these
+                    # images aren't skipped as processed forever
+                    self._unclaim_hashes(item[1] for item in chunk)
+                    continue
+
+            if buffer:
+                flush_queue.put(buffer)
+        finally:
+            decode_pool.shutdown(wait=False)
+            flush_queue.put(None)  # Sentinel: no more batches
+            writer.join()
+
         logger.info(f"🎯 Processing complete:")
         logger.info(f"   📊 Images processed: {processed_count}/{len(images)}")
         logger.info(f"   🔍 Total detections: {total_detections}")
     
     def get_detection_summary(self):
-        """Get summary of detection results"""
+        """Get summary of detection results
+
+        All three aggregates travel in one statement - a single
+        round-trip instead of three, and the planner can share the scan
+        between the CTEs. The grouped results come back as json_agg
+        arrays, which psycopg2 deserializes to plain dicts.
+        """
         try:
-            with self.db_conn.cursor() as cur:
-                # Total detections
-                cur.execute("SELECT COUNT(*) FROM raw.image_detections")
-                total_detections = cur.fetchone()[0]
-                
-                # Most detected objects
-                cur.execute("""
-                    SELECT detected_object_class, COUNT(*) as count
-                    FROM raw.image_detections
-                    GROUP BY detected_object_class
-                    ORDER BY count DESC
-                    LIMIT 10
-                """)
-                top_objects = cur.fetchall()
-                
-                # Detections by channel
+            with self._db() as conn, conn.cursor() as cur:
                 cur.execute("""
-                    SELECT channel_name, COUNT(*) as count
-                    FROM raw.image_detections
-                    WHERE channel_name IS NOT NULL
-                    GROUP BY channel_name
-                    ORDER BY count DESC
+                    WITH totals AS (
+                        SELECT COUNT(*) AS c FROM raw.image_detections
+                    ),
+                    top_objects AS (
+                        SELECT detected_object_class AS name, COUNT(*) AS count
+                        FROM raw.image_detections
+                        GROUP BY detected_object_class
+                        ORDER BY count DESC
+                        LIMIT 10
+                    ),
+                    by_channel AS (
+                        SELECT channel_name AS name, COUNT(*) AS count
+                        FROM raw.image_detections
+                        WHERE channel_name IS NOT NULL
+                        GROUP BY channel_name
+                        ORDER BY count DESC
+                    )
+                    SELECT
+                        (SELECT c FROM totals),
+                        (SELECT json_agg(top_objects) FROM top_objects),
+                        (SELECT json_agg(by_channel) FROM by_channel)
                 """)
-                by_channel = cur.fetchall()
-                
+                total_detections, top_objects, by_channel = cur.fetchone()
+
                 logger.info(f"📊 Detection Summary:")
                 logger.info(f"   Total detections: {total_detections}")
                 logger.info(f"   Top objects detected:")
-                for obj, count in top_objects:
-                    logger.info(f"     - {obj}: {count}")
+                for entry in top_objects or []:
+                    logger.info(f"     - {entry['name']}: {entry['count']}")
                 logger.info(f"   By channel:")
-                for channel, count in by_channel:
-                    logger.info(f"     - {channel}: {count}")
-                    
+                for entry in by_channel or []:
+                    logger.info(f"     - {entry['name']}: {entry['count']}")
+
         except Exception as e:
             logger.error(f"❌ Failed to get detection summary: {e}")
     
     def close(self):
-        """Close database connection"""
-        if self.db_conn:
-            self.db_conn.close()
-            logger.info("🔒 Database connection closed")
+        """Close all pooled database connections"""
+        if self.pool:
+            self.pool.closeall()
+            logger.info("🔒 Database connections closed")
 
 
 def main():
@@ -0,0 +1,14 @@
+{{ config(
+    materialized = 'materialized_view',
+    indexes = [
+        {'columns': ['detected_object_class'], 'unique': True}
+    ]
+) }}
+-- Pre-aggregated object counts so the pipeline's "top objects"
+-- metadata is a cheap lookup instead of a GROUP BY over the whole
+-- detections table on every asset run. The unique index enables
+-- REFRESH MATERIALIZED VIEW CONCURRENTLY.
+SELECT detected_object_class,
+    COUNT(*) AS cnt
+FROM {{ source('raw', 'image_detections') }}
+GROUP BY detected_object_class